@@ -0,0 +1,68 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+def normalize_text(text: str) -> str:
+    """Collapse runs of whitespace so trivially different copies share a key."""
+    return " ".join(text.split())
+
+
+def text_hash(text: str, normalize: bool = True) -> str:
+    """Return the sha256 hex digest of a (normalized) text."""
+    if normalize:
+        text = normalize_text(text)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = 1024):
+        """Thread-safe bounded LRU mapping with hit/miss counters. maxsize=0 disables caching."""
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """Return the cached value (marking it recently used) or default."""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any):
+        """Insert a value, evicting the least recently used entry when full."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def info(self) -> Dict[str, float]:
+        """Return hit/miss counters and occupancy."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+            }
@@ -1,9 +1,13 @@
 import arxiv
 import requests
 import os
-import pandas as pd
-import random
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
 
 # Define parameters
@@ -13,64 +17,185 @@ MAX_RESULTS = 100  # Fetch extra to ensure we have enough
 YEAR_CUTOFF = 2022   # Only include papers from this year onwards
 OUTPUT_DIR = "arxiv_papers"
 
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+# Results per arXiv API page
+PAGE_SIZE = 100
+# Override to download from a mirror or a local stand-in server
+PDF_BASE_URL = os.getenv("ARXIV_PDF_URL", "https://arxiv.org/pdf")
+# Concurrent PDF transfers, and the minimum seconds between two requests to the same host
+DOWNLOAD_CONCURRENCY = int(os.getenv("ARXIV_DOWNLOAD_CONCURRENCY", "4"))
+REQUEST_INTERVAL = float(os.getenv("ARXIV_REQUEST_INTERVAL", "1.0"))
+# Retries of a download after a transient error, waiting BACKOFF_FACTOR * 2**attempt seconds (or the
+# server's Retry-After) before each; retries go through the rate limiter like first attempts
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 2.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
 
-# ArXiv client to handle pagination
-client = arxiv.Client()
 
 # Step 1: Fetch papers from arXiv with pagination and filter by year
-def fetch_arxiv_papers(query, category, max_results, year_cutoff):
-    papers = []
-    start = 0
-    batch_size = 100  # Fetch in smaller batches
+def fetch_arxiv_papers(query: str, category: str, max_results: int, year_cutoff: int,
+                       page_size: int = PAGE_SIZE) -> List[Dict]:
+    """Fetch up to max_results papers, newest first, published in year_cutoff or later."""
+    # The client requests successive pages (offset += page_size) and waits between them
+    client = arxiv.Client(page_size=page_size, delay_seconds=3, num_retries=3)
+    search = arxiv.Search(
+        query=f"{query} AND cat:{category}",
+        max_results=max_results,
+        sort_by=arxiv.SortCriterion.SubmittedDate  # Sort by most recent first
+    )
 
+    papers = []
     print(f"Fetching papers from arXiv (Only from {year_cutoff} and later)...")
-    while start < max_results:
-        search = arxiv.Search(
-            query=f"{query} AND cat:{category}",
-            max_results=batch_size,
-            sort_by=arxiv.SortCriterion.SubmittedDate  # Sort by most recent first
-        )
+    for paper in client.results(search):
+        pub_year = paper.published.year  # Extract year
+        if pub_year < year_cutoff:
+            break  # Results are newest first, so every later one is older too
+        papers.append({
+            "title": paper.title,
+            "arxiv_id": paper.entry_id.split('/')[-1],
+            "url": paper.entry_id,
+            "year": pub_year  # Store the publication year
+        })
+    return papers
+
+
+def pdf_filename(title: str) -> str:
+    return f"{title.replace(' ', '_').replace('/', '_')}.pdf"
+
+
+class HostRateLimiter:
+    def __init__(self, interval: float = REQUEST_INTERVAL):
+        """Spaces request starts to the same host at least `interval` seconds apart, across threads."""
+        self.interval = interval
+        self._next_slot: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str):
+        """Block until a request to url's host may start."""
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def defer(self, url: str, delay: float):
+        """Hold back every request to url's host for at least `delay` seconds (e.g. after a 429)."""
+        host = urlparse(url).netloc
+        with self._lock:
+            self._next_slot[host] = max(self._next_slot.get(host, 0.0), time.monotonic() + delay)
+
+
+def retry_after_seconds(response: requests.Response) -> Optional[float]:
+    """The Retry-After header of a response in seconds, if it has a valid one."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def make_session(pool_size: int = DOWNLOAD_CONCURRENCY) -> requests.Session:
+    """Session with a connection pool sized for the downloaders. It does not retry by itself:
+    PDFDownloader.download retries through the rate limiter."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class PDFDownloader:
+    def __init__(self, output_dir: str = OUTPUT_DIR, base_url: str = PDF_BASE_URL,
+                 concurrency: int = DOWNLOAD_CONCURRENCY, interval: float = REQUEST_INTERVAL,
+                 session: Optional[requests.Session] = None):
+        """Concurrent, resumable PDF downloads through one pooled session."""
+        self.output_dir = output_dir
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.session = session or make_session(concurrency)
+        self.rate_limiter = HostRateLimiter(interval)
+
+    def pdf_url(self, arxiv_id: str) -> str:
+        return f"{self.base_url}/{arxiv_id}.pdf"
+
+    def download(self, url: str, path: str, chunk_size: int = 1 << 16, max_retries: int = MAX_RETRIES) -> bool:
+        """Stream url into path via a .part file; returns False if path already existed.
+        Transient failures are retried, each attempt waiting for its turn at the rate limiter."""
+        if os.path.exists(path):
+            return False
+        tmp_path = f"{path}.part"
         try:
-            batch_papers = list(client.results(search))
-            if not batch_papers:
-                print(f"Empty batch received at start={start}. Stopping.")
-                break  # Stop fetching if we get an empty batch
-
-            for paper in batch_papers:
-                pub_year = paper.published.year  # Extract year
-                if pub_year >= year_cutoff:
-                    papers.append({
-                        "title": paper.title,
-                        "arxiv_id": paper.entry_id.split('/')[-1],
-                        "url": paper.entry_id,
-                        "year": pub_year  # Store the publication year
-                    })
-            
-            start += batch_size
-            time.sleep(2)  # Avoid hitting rate limits
-
-        except Exception as e:
-            print(f"Error fetching batch {start}: {e}")
-            time.sleep(5)  # Wait and retry
-
-    return pd.DataFrame(papers)
-
-df = fetch_arxiv_papers(QUERY, CATEGORY, MAX_RESULTS, YEAR_CUTOFF)
-df_filtered = df[df["year"] >= YEAR_CUTOFF]
-final_selection = df_filtered
-
-print(f"Downloading papers from {YEAR_CUTOFF} and later...")
-for _, row in tqdm(final_selection.iterrows(), total=len(final_selection)):
-    arxiv_id = row["arxiv_id"]
-    
-    # Download PDF
-    pdf_url = f"https://arxiv.org/pdf/{arxiv_id}.pdf"
-    pdf_filename = os.path.join(OUTPUT_DIR, f"{row['title'].replace(' ', '_').replace('/', '_')}.pdf")
-    
-    pdf_response = requests.get(pdf_url)
-    if pdf_response.status_code == 200:
-        with open(pdf_filename, "wb") as f:
-            f.write(pdf_response.content)
-
-print(f"Downloaded {len(final_selection)} papers from {YEAR_CUTOFF} and later. PDFs in {OUTPUT_DIR}/, HTML in {HTML_DIR}/.")
\ No newline at end of file
+            for attempt in range(max_retries + 1):
+                self.rate_limiter.wait(url)
+                delay = BACKOFF_FACTOR * 2 ** attempt
+                try:
+                    with self.session.get(url, stream=True, timeout=(10, 60)) as response:
+                        if response.status_code in RETRY_STATUSES and attempt < max_retries:
+                            # Back off the whole host, for every downloader thread
+                            self.rate_limiter.defer(url, retry_after_seconds(response) or delay)
+                            continue
+                        response.raise_for_status()
+                        with open(tmp_path, "wb") as f:
+                            for chunk in response.iter_content(chunk_size=chunk_size):
+                                f.write(chunk)
+                except (requests.ConnectionError, requests.Timeout):
+                    if attempt == max_retries:
+                        raise
+                    self.rate_limiter.defer(url, delay)
+                    continue
+                # Only complete files ever appear under the final name
+                os.replace(tmp_path, path)
+                return True
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def download_all(self, jobs: List[Tuple[str, str]]) -> Dict[str, str]:
+        """Download (url, path) jobs with up to `concurrency` transfers at once.
+        Returns {path: error} for the failed ones."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        downloaded, skipped, failures = 0, 0, {}
+
+        def run(job):
+            url, path = job
+            try:
+                return path, self.download(url, path), None
+            except Exception as e:
+                return path, False, f"{type(e).__name__}: {e}"
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for path, fetched, error in tqdm(pool.map(run, jobs), total=len(jobs)):
+                if error is not None:
+                    failures[path] = error
+                elif fetched:
+                    downloaded += 1
+                else:
+                    skipped += 1
+
+        print(f"Downloaded {downloaded} PDFs, skipped {skipped} already present, {len(failures)} failed.")
+        for path, error in sorted(failures.items()):
+            print(f"  ✗ {os.path.basename(path)}: {error}")
+        return failures
+
+    def download_papers(self, papers: List[Dict]) -> Dict[str, str]:
+        """Download the PDF of every paper returned by fetch_arxiv_papers."""
+        return self.download_all([(self.pdf_url(paper["arxiv_id"]), os.path.join(self.output_dir, pdf_filename(paper["title"])))
+                                  for paper in papers])
+
+
+def main():
+    papers = fetch_arxiv_papers(QUERY, CATEGORY, MAX_RESULTS, YEAR_CUTOFF)
+    print(f"Downloading {len(papers)} papers from {YEAR_CUTOFF} and later...")
+    PDFDownloader(OUTPUT_DIR).download_papers(papers)
+    print(f"PDFs in {OUTPUT_DIR}/.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,69 +1,81 @@
+import PyPDF2
+import json
 import os
-import re
-from typing import Dict, Optional, Tuple
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+
+from data_preprocessing.pdf_utils import EXTRACTION_TIMEOUT, convert_pdf_folder
+from data_preprocessing.segmentation import find_section, segment
+
+# Pages read at most when extracting front matter straight from a PDF
+MAX_FRONT_MATTER_PAGES = 3
+
+def locate_abstract(content: str) -> Optional[Tuple[int, int, Optional[int]]]:
+    """
+    Find the abstract in the text.
+    Returns (header start, abstract start, abstract end) offsets, with abstract end None when no
+    closing section marker follows the abstract, or None if no abstract header is found.
+    """
+    sections = segment(content, abstract_only=True)
+    abstract = find_section(sections, "abstract")
+    if abstract is None:
+        return None
+    # The abstract is closed if any section header follows it
+    closed = sections[-1] is not abstract
+    return abstract.start, abstract.body_start, abstract.end if closed else None
 
 def extract_front_matter(content: str) -> Tuple[str, str]:
     """
     Extract the front matter (everything before abstract) and the abstract from the text.
     Returns a tuple of (front_matter, abstract)
     """
-    # Common patterns for abstract headers
-    abstract_patterns = [
-        r'\nAbstract[\n\s]*',
-        r'\nABSTRACT[\n\s]*',
-        r'\n[0-9]+\.?\s*Abstract[\n\s]*',
-        r'\nAbstract[:.]\s*',
-        r'\n[0-9]+\.?\s*ABSTRACT[\n\s]*'
-    ]
-    
-    # Try to find the abstract section
-    abstract_start = None
-    abstract_pattern_used = None
-    
-    for pattern in abstract_patterns:
-        match = re.search(pattern, content)
-        if match:
-            abstract_start = match.start()
-            abstract_pattern_used = pattern
-            break
-    
-    if abstract_start is None:
+    location = locate_abstract(content)
+    if location is None:
         return content, ""  # Return entire content if no abstract found
     
-    # Extract front matter (everything before abstract)
-    front_matter = content[:abstract_start].strip()
-    
-    # Extract abstract
-    abstract_text = ""
-    if abstract_pattern_used:
-        # Get the text after the abstract header
-        post_abstract = content[abstract_start:]
-        abstract_match = re.split(abstract_pattern_used, post_abstract, maxsplit=1)
-        if len(abstract_match) > 1:
-            # Try to find where abstract ends (next section or reasonable length)
-            abstract_text = abstract_match[1]
-            
-            # Look for common section headers that might come after abstract
-            section_patterns = [
-                r'\n[0-9]+\.?\s*Introduction\s*\n',
-                r'\nIntroduction\s*\n',
-                r'\n[0-9]+\.?\s*Background\s*\n',
-                r'\n[0-9]+\.?\s*Related Work\s*\n',
-                r'\nKeywords[:.]',
-                r'\n[0-9]+\.\s' 
-                r'\n[0-9]+\.\s'
-            ]
-            
-            # Find the earliest occurrence of any section pattern
-            min_pos = len(abstract_text)
-            for pattern in section_patterns:
-                match = re.search(pattern, abstract_text)
-                if match and match.start() < min_pos:
-                    min_pos = match.start()
-            
-            abstract_text = abstract_text[:min_pos].strip()
-    
-    return front_matter, abstract_text
+    abstract_start, body_start, body_end = location
+    # Abstract runs to the next section header, or to the end of the text
+    return content[:abstract_start].strip(), content[body_start:body_end].strip()
+
+def extract_front_matter_from_pdf(pdf_path: str, max_pages: int = MAX_FRONT_MATTER_PAGES) -> Tuple[str, str]:
+    """
+    Extract (front_matter, abstract) from a PDF, reading pages one at a time and stopping as soon as
+    the section after the abstract is found, or after max_pages pages.
+    """
+    with open(pdf_path, 'rb') as file:
+        pages = PyPDF2.PdfReader(file).pages
+        text = ""
+        for page in pages[:max_pages]:
+            text += ("\n" if text else "") + page.extract_text()
+            location = locate_abstract(text)
+            if location is not None and location[2] is not None:
+                break
+    return extract_front_matter(text)
+
+def format_front_matter(front_matter: str, abstract: str) -> str:
+    """Front matter file contents, as stored in the vector DB documents."""
+    return f"=== FRONT MATTER ===\n\n{front_matter}\n\n=== ABSTRACT ===\n\n{abstract}"
+
+def write_front_matter(path: str, front_matter: str, abstract: str):
+    """Write a front matter file in the format read by read_front_matter."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(format_front_matter(front_matter, abstract))
+
+def read_front_matter(path: str) -> Tuple[str, str]:
+    """Read (front_matter, abstract) back from a file written by write_front_matter."""
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    front_matter, _, abstract = content[len("=== FRONT MATTER ===\n\n"):].partition("\n\n=== ABSTRACT ===\n\n")
+    return front_matter, abstract
+
+def convert_pdf_to_front_matter(pdf_path: str, output_path: str, max_pages: int = MAX_FRONT_MATTER_PAGES):
+    """Write the front matter file of a PDF without extracting its full text."""
+    front_matter, abstract = extract_front_matter_from_pdf(pdf_path, max_pages)
+    if not front_matter.strip() and not abstract:
+        raise ValueError("no text extracted")
+    tmp_path = f"{output_path}.tmp"
+    write_front_matter(tmp_path, front_matter, abstract)
+    os.replace(tmp_path, output_path)
 
 def process_document(file_path: str) -> Dict[str, str]:
     """Process a single document and extract its front matter and abstract."""
@@ -104,11 +116,7 @@ def process_document_folder(input_folder: str, output_folder: str = "front_matte
             base_name = os.path.splitext(filename)[0]
             output_path = os.path.join(output_folder, f"{base_name}_front_matter.txt")
             
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write("=== FRONT MATTER ===\n\n")
-                f.write(result["front_matter"])
-                f.write("\n\n=== ABSTRACT ===\n\n")
-                f.write(result["abstract"])
+            write_front_matter(output_path, result["front_matter"], result["abstract"])
             
             all_documents.append(result)
             print(f"✓ Extracted front matter from {filename}")
@@ -116,13 +124,40 @@ def process_document_folder(input_folder: str, output_folder: str = "front_matte
             print(f"✗ Failed to process {filename}")
     
     # Save summary to JSON
-    import json
     summary_path = os.path.join(output_folder, "front_matter_summary.json")
     with open(summary_path, 'w', encoding='utf-8') as f:
         json.dump(all_documents, f, indent=2, ensure_ascii=False)
     
     print(f"\nProcessed {len(all_documents)} documents. Results saved to {output_folder}/")
 
+def process_pdf_folder(pdf_folder: str, output_folder: str = "front_matter",
+                       max_pages: int = MAX_FRONT_MATTER_PAGES, workers: Optional[int] = None,
+                       timeout: float = EXTRACTION_TIMEOUT, force: bool = False) -> List[str]:
+    """
+    Extract front matter straight from the PDFs in a folder, without writing full-text files.
+    Only the first pages up to the end of the abstract are parsed; see pdf_utils.convert_pdf_folder
+    for parallelism, timeouts and skipping of unchanged PDFs. Also writes the summary JSON.
+    """
+    outputs = convert_pdf_folder(pdf_folder, output_folder, partial(convert_pdf_to_front_matter, max_pages=max_pages),
+                                 lambda filename: f"{os.path.splitext(filename)[0]}_front_matter.txt",
+                                 workers=workers, timeout=timeout, force=force)
+    
+    all_documents = []
+    for output_path in sorted(outputs):
+        front_matter, abstract = read_front_matter(output_path)
+        all_documents.append({
+            "filename": os.path.basename(output_path)[:-len("_front_matter.txt")] + ".pdf",
+            "front_matter": front_matter,
+            "abstract": abstract
+        })
+    
+    summary_path = os.path.join(output_folder, "front_matter_summary.json")
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(all_documents, f, indent=2, ensure_ascii=False)
+    
+    print(f"\nProcessed {len(all_documents)} documents. Results saved to {output_folder}/")
+    return outputs
+
 if __name__ == "__main__":
     # Example usage
     input_folder = "datas/documents"  # folder containing text files
@@ -1,65 +1,309 @@
 import PyPDF2
+import hashlib
+import json
+import multiprocessing
 import os
-from typing import List
+import time
+from multiprocessing.connection import wait
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Records the content hash of every converted PDF so reruns skip unchanged files
+MANIFEST_FILENAME = ".extraction_manifest.json"
+# Seconds a single PDF may take before its worker is killed
+EXTRACTION_TIMEOUT = 120
+# Safe to start from threads, unlike fork
+SPAWN = multiprocessing.get_context("spawn")
+
+
+def read_pdf_text(pdf_path: str) -> str:
+    """Extract the text of every page of a PDF file; raises on unreadable files."""
+    with open(pdf_path, 'rb') as file:
+        # Create PDF reader object
+        pdf_reader = PyPDF2.PdfReader(file)
+
+        # Extract text from each page
+        text = []
+        for page in pdf_reader.pages:
+            text.append(page.extract_text())
+
+        return "\n".join(text)
+
 
 def extract_text_from_pdf(pdf_path: str) -> str:
     """Extract text content from a PDF file."""
     try:
-        with open(pdf_path, 'rb') as file:
-            # Create PDF reader object
-            pdf_reader = PyPDF2.PdfReader(file)
-            
-            # Extract text from each page
-            text = []
-            for page in pdf_reader.pages:
-                text.append(page.extract_text())
-            
-            return "\n".join(text)
+        return read_pdf_text(pdf_path)
     except Exception as e:
         print(f"Error extracting text from PDF {pdf_path}: {str(e)}")
         return ""
 
-def process_pdf_folder(folder_path: str, output_folder: str = "data") -> List[str]:
-    """
-    Process all PDFs in a folder and convert them to text files.
-    Returns list of created text file paths.
-    """
-    # Create output folder if it doesn't exist
+
+def write_text(path: str, text: str):
+    """Write text through a temporary sibling so an interrupted run never leaves a partial file."""
+    # Clean the text content by replacing invalid Unicode characters
+    text = text.encode('utf-8', errors='replace').decode('utf-8')
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def convert_pdf_to_text(pdf_path: str, txt_path: str):
+    """Write the full text of pdf_path to txt_path."""
+    text = read_pdf_text(pdf_path)
+    if not text.strip():
+        raise ValueError("no text extracted")
+    write_text(txt_path, text)
+
+
+def file_hash(path: str) -> str:
+    """sha256 hex digest of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_extraction_manifest(output_folder: str) -> Dict[str, str]:
+    """Map PDF filename -> sha256 of the content last converted into output_folder."""
+    path = os.path.join(output_folder, MANIFEST_FILENAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_extraction_manifest(output_folder: str, manifest: Dict[str, str]):
+    path = os.path.join(output_folder, MANIFEST_FILENAME)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+
+def is_up_to_date(pdf_path: str, output_path: str, digest: str, manifest: Dict[str, str]) -> bool:
+    """The output exists, is newer than the PDF, and was made from the same content."""
+    return (os.path.exists(output_path)
+            and os.path.getmtime(output_path) >= os.path.getmtime(pdf_path)
+            and manifest.get(os.path.basename(pdf_path)) == digest)
+
+
+def _run_job(convert: Callable[[str, str], None], pdf_path: str, output_path: str, conn):
+    """Worker process body: convert one PDF and report the error message, if any."""
+    try:
+        convert(pdf_path, output_path)
+        conn.send(None)
+    except Exception as e:
+        conn.send(f"{type(e).__name__}: {e}")
+    finally:
+        conn.close()
+
+
+def _serve(conn):
+    """ProcessWorker body: run (fn, args) jobs until told to stop, reporting each result or error."""
+    conn.send(None)  # Ready: imports are done, so they do not count against the first call's timeout
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        fn, args = job
+        try:
+            conn.send((True, fn(*args)))
+        except Exception as e:
+            conn.send((False, f"{type(e).__name__}: {e}"))
+    conn.close()
+
+
+class ProcessWorker:
+    def __init__(self):
+        """A long-lived worker process that runs one call at a time and is replaced if a call times out.
+        Workers are spawned rather than forked, so they can be started from a multithreaded parent."""
+        self.process = None
+        self.conn = None
+
+    def start(self):
+        self.conn, child_conn = SPAWN.Pipe()
+        self.process = SPAWN.Process(target=_serve, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        try:
+            self.conn.recv()
+        except EOFError:
+            raise RuntimeError(f"worker failed to start (exit code {self.process.exitcode})")
+
+    def call(self, fn: Callable, *args, timeout: float = EXTRACTION_TIMEOUT):
+        """Return fn(*args) computed in the worker; a call running longer than `timeout` seconds kills it."""
+        if self.process is None or not self.process.is_alive():
+            self.close()
+            self.start()
+        self.conn.send((fn, args))
+        if not self.conn.poll(timeout):
+            self.process.kill()
+            self.close()
+            raise TimeoutError(f"timed out after {timeout:.0f}s")
+        try:
+            ok, value = self.conn.recv()
+        except EOFError:
+            exitcode = self.process.exitcode
+            self.close()
+            raise RuntimeError(f"worker exited with code {exitcode}")
+        if not ok:
+            raise RuntimeError(value)
+        return value
+
+    def close(self):
+        """Stop the worker process, if any."""
+        if self.process is None:
+            return
+        if self.process.is_alive():
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+            self.process.join(timeout=5)
+            if self.process.is_alive():
+                self.process.kill()
+        self.process.join()
+        self.conn.close()
+        self.process, self.conn = None, None
+
+
+def run_extraction(jobs: List[Tuple[str, str]], convert: Callable[[str, str], None],
+                   workers: Optional[int] = None, timeout: float = EXTRACTION_TIMEOUT,
+                   on_done: Optional[Callable[[str, str, Optional[str]], None]] = None) -> Dict[str, str]:
+    """Run convert(pdf_path, output_path) for every job, each in its own process with up to `workers`
+    running at once. A process running longer than `timeout` seconds is killed.
+    Returns {pdf_path: error} for the failed jobs; on_done(pdf_path, output_path, error) is called as jobs finish."""
+    workers = workers or os.cpu_count() or 1
+    pending = list(reversed(jobs))
+    running = {}  # connection -> (process, pdf_path, output_path, started)
+    failures = {}
+
+    def finish(conn, error):
+        process, pdf_path, output_path, _ = running.pop(conn)
+        # The result is in (or the worker is gone): give it a moment to exit, then make sure it does
+        process.join(timeout=1)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        conn.close()
+        if error is not None:
+            failures[pdf_path] = error
+        if on_done is not None:
+            on_done(pdf_path, output_path, error)
+
+    while pending or running:
+        while pending and len(running) < workers:
+            pdf_path, output_path = pending.pop()
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=_run_job, args=(convert, pdf_path, output_path, sender), daemon=True)
+            process.start()
+            sender.close()
+            running[receiver] = (process, pdf_path, output_path, time.monotonic())
+
+        # Wake up when a worker reports (or dies, which closes its end of the pipe), or in time to
+        # enforce the earliest deadline. Waiting on the pipes rather than on process exit means a
+        # worker that has sent its result is always collected, even if it has not exited yet.
+        next_deadline = min(started for *_, started in running.values()) + timeout
+        for conn in wait(list(running), timeout=max(0.0, next_deadline - time.monotonic())):
+            process = running[conn][0]
+            try:
+                error = conn.recv()
+            except EOFError:
+                process.join()
+                error = f"worker exited with code {process.exitcode}"
+            finish(conn, error)
+
+        now = time.monotonic()
+        for conn, (process, _, _, started) in list(running.items()):
+            # A result that arrived since wait() returned is collected on the next pass
+            if now - started > timeout and not conn.poll():
+                process.kill()
+                finish(conn, f"timed out after {timeout:.0f}s")
+
+    return failures
+
+
+def print_failures(failures: Dict[str, str]):
+    """Summarize failed files and their errors."""
+    if not failures:
+        return
+    print(f"\n{len(failures)} file(s) failed:")
+    for pdf_path, error in sorted(failures.items()):
+        print(f"  ✗ {os.path.basename(pdf_path)}: {error}")
+
+
+def convert_pdf_folder(folder_path: str, output_folder: str, convert: Callable[[str, str], None],
+                       output_name: Callable[[str], str], workers: Optional[int] = None,
+                       timeout: float = EXTRACTION_TIMEOUT, force: bool = False) -> List[str]:
+    """Convert every PDF in folder_path with `convert`, in parallel, skipping up-to-date outputs.
+    Returns the output paths that are current after the run."""
     os.makedirs(output_folder, exist_ok=True)
-    
-    created_files = []
-    
-    # Process each PDF file
-    for filename in os.listdir(folder_path):
+    manifest = {} if force else load_extraction_manifest(output_folder)
+
+    jobs, digests, outputs = [], {}, []
+    for filename in sorted(os.listdir(folder_path)):
         if not filename.lower().endswith('.pdf'):
             continue
-            
         pdf_path = os.path.join(folder_path, filename)
-        txt_filename = os.path.splitext(filename)[0] + '.txt'
-        txt_path = os.path.join(output_folder, txt_filename)
-        
-        # Extract text from PDF
-        text_content = extract_text_from_pdf(pdf_path)
-        
-        if text_content:
-            try:
-                # Clean the text content by replacing invalid Unicode characters
-                text_content = text_content.encode('utf-8', errors='replace').decode('utf-8')
-                
-                # Write to text file
-                with open(txt_path, 'w', encoding='utf-8') as f:
-                    f.write(text_content)
-                created_files.append(txt_path)
-                print(f"✓ Converted {filename} to {txt_filename}")
-            except Exception as e:
-                print(f"✗ Failed to write {filename}: {str(e)}")
+        output_path = os.path.join(output_folder, output_name(filename))
+        digest = file_hash(pdf_path)
+        if is_up_to_date(pdf_path, output_path, digest, manifest):
+            outputs.append(output_path)
+            continue
+        digests[pdf_path] = digest
+        jobs.append((pdf_path, output_path))
+
+    skipped = len(outputs)
+    print(f"Converting {len(jobs)} PDFs with {workers or os.cpu_count()} workers ({skipped} up to date)...")
+    start_time = time.perf_counter()
+    completed = 0
+
+    def on_done(pdf_path: str, output_path: str, error: Optional[str]):
+        nonlocal completed
+        filename = os.path.basename(pdf_path)
+        if error is None:
+            manifest[filename] = digests[pdf_path]
+            outputs.append(output_path)
+            print(f"✓ Converted {filename} to {os.path.basename(output_path)}")
         else:
-            print(f"✗ Failed to convert {filename}")
-    
-    return created_files
+            manifest.pop(filename, None)
+            print(f"✗ Failed to convert {filename}: {error}")
+        completed += 1
+        # Save progress periodically so an interrupted run resumes where it stopped
+        if completed % 50 == 0:
+            save_extraction_manifest(output_folder, manifest)
+
+    try:
+        failures = run_extraction(jobs, convert, workers=workers, timeout=timeout, on_done=on_done)
+    finally:
+        save_extraction_manifest(output_folder, manifest)
+
+    elapsed = time.perf_counter() - start_time
+    print(f"\nConverted {len(jobs) - len(failures)} PDFs in {elapsed:.1f}s, "
+          f"skipped {skipped} up to date, {len(failures)} failed.")
+    print_failures(failures)
+    return outputs
+
+
+def process_pdf_folder(folder_path: str, output_folder: str = "data", workers: Optional[int] = None,
+                       timeout: float = EXTRACTION_TIMEOUT, force: bool = False) -> List[str]:
+    """
+    Process all PDFs in a folder and convert them to text files, one process per PDF with up to
+    `workers` (default: all cores) at a time. PDFs whose text file is newer and whose content hash is
+    unchanged are skipped unless force=True.
+    Returns list of text file paths for all successfully converted PDFs.
+    """
+    return convert_pdf_folder(folder_path, output_folder, convert_pdf_to_text,
+                              lambda filename: os.path.splitext(filename)[0] + '.txt',
+                              workers=workers, timeout=timeout, force=force)
+
 
 if __name__ == "__main__":
     # Example usage
     pdf_folder = "arxiv_papers"  # folder containing PDFs
     output_folder = "documents"  # folder for output text files
-    process_pdf_folder(pdf_folder, output_folder) 
\ No newline at end of file
+    process_pdf_folder(pdf_folder, output_folder)
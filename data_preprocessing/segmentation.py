@@ -0,0 +1,86 @@
+import re
+from typing import List, NamedTuple, Optional
+
+# Abstract headers in priority order: the first kind found anywhere in a document wins, at its first
+# occurrence. "Abstract:" / "Abstract." headers are matched by the plain "Abstract" kind.
+ABSTRACT_HEADERS = [
+    ("abstract", r'Abstract[\n\s]*'),
+    ("ABSTRACT", r'ABSTRACT[\n\s]*'),
+    ("numbered_abstract", r'[0-9]+\.?\s*Abstract[\n\s]*'),
+    ("numbered_ABSTRACT", r'[0-9]+\.?\s*ABSTRACT[\n\s]*'),
+]
+
+# Headers that end the abstract and start a new section; the first matching one names the section
+SECTION_HEADERS = [
+    ("introduction", r'[0-9]+\.?\s*Introduction\s*\n'),
+    ("introduction", r'Introduction\s*\n'),
+    ("background", r'[0-9]+\.?\s*Background\s*\n'),
+    ("related_work", r'[0-9]+\.?\s*Related Work\s*\n'),
+    ("keywords", r'Keywords[:.]'),
+    ("section", r'[0-9]+\.\s'),
+]
+
+
+def _lookahead(group_prefix: str, headers) -> str:
+    alternatives = "|".join(f"(?P<{group_prefix}{i}>{pattern})" for i, (_, pattern) in enumerate(headers))
+    return f"(?:(?={alternatives}))?"
+
+
+# Every header starts at a newline followed by a digit, "A", "I" or "K"; the cheap class check skips
+# all other lines. One optional zero-width lookahead per header family then lets a single finditer pass
+# report, at each such line, both an abstract header and a section header without consuming text,
+# so headers that overlap (e.g. "1. Abstract" is also a numbered section) are all seen.
+HEADER_PATTERN = re.compile(r'\n(?=[0-9AIK])' + _lookahead("a", ABSTRACT_HEADERS) + _lookahead("s", SECTION_HEADERS))
+ABSTRACT_GROUPS = [f"a{i}" for i in range(len(ABSTRACT_HEADERS))]
+SECTION_GROUPS = [(f"s{i}", name) for i, (name, _) in enumerate(SECTION_HEADERS)]
+
+
+class Section(NamedTuple):
+    name: str         # "front_matter", "abstract", "introduction", "keywords", ...
+    start: int        # Offset of the header (of the section start for front matter)
+    body_start: int   # Offset just past the header
+    end: int          # Offset where the next section starts, or the end of the text
+
+
+def segment(content: str, abstract_only: bool = False) -> List[Section]:
+    """
+    Split a document into sections with one scan of HEADER_PATTERN.
+    Returns the front matter, the abstract, then every recognized section header after the abstract,
+    in document order. Without an abstract header the whole text is front matter.
+    With abstract_only=True the scan stops once the abstract is known and closed, so only the
+    first section after it is returned.
+    """
+    first_abstract = [None] * len(ABSTRACT_HEADERS)   # (start, body_start) of each kind's first match
+    section_headers = []                              # (start, body_start, name) in document order
+    for match in HEADER_PATTERN.finditer(content):
+        if match.lastgroup is None:
+            continue
+        for i, group in enumerate(ABSTRACT_GROUPS):
+            if first_abstract[i] is None and match.start(group) >= 0:
+                first_abstract[i] = (match.start(), match.end(group))
+        for group, name in SECTION_GROUPS:
+            if match.start(group) >= 0:
+                section_headers.append((match.start(), match.end(group), name))
+                break
+        # A top-priority header cannot be superseded, so a section after it settles the abstract
+        if (abstract_only and first_abstract[0] is not None and section_headers
+                and section_headers[-1][0] >= first_abstract[0][1]):
+            break
+
+    header = next((found for found in first_abstract if found is not None), None)
+    if header is None:
+        return [Section("front_matter", 0, 0, len(content))]
+
+    abstract_start, body_start = header
+    # Sections must start after the abstract header, including any whitespace it swallowed
+    following = [h for h in section_headers if h[0] >= body_start]
+    sections = [Section("front_matter", 0, 0, abstract_start)]
+    sections.append(Section("abstract", abstract_start, body_start, following[0][0] if following else len(content)))
+    for (start, section_body, name), next_header in zip(following, following[1:] + [None]):
+        sections.append(Section(name, start, section_body, next_header[0] if next_header else len(content)))
+    return sections
+
+
+def find_section(sections: List[Section], name: str) -> Optional[Section]:
+    """The first section with the given name, if any."""
+    return next((section for section in sections if section.name == name), None)
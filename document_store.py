@@ -0,0 +1,129 @@
+import json
+import os
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from vector_store import append_npy
+
+# Each field of documents.json is stored as a UTF-8 blob plus an offsets index
+DOCUMENT_FIELDS = ("content", "main_point")
+
+
+def store_paths(output_dir: str, field: str):
+    """(blob, offsets) file paths of one document field."""
+    return (os.path.join(output_dir, f"documents_{field}.bin"),
+            os.path.join(output_dir, f"documents_{field}.offsets.npy"))
+
+
+class StringStore:
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        """Read-only list of strings backed by a UTF-8 blob and offsets (n + 1 of them).
+        Strings are decoded on access; append() keeps new ones in memory."""
+        self.blob = blob
+        self.offsets = offsets
+        self.extra: List[str] = []
+
+    @classmethod
+    def open(cls, blob_path: str, offsets_path: str) -> "StringStore":
+        """Memory-map a store written by write()."""
+        offsets = np.load(offsets_path, mmap_mode="r")
+        # np.memmap refuses empty files
+        blob = np.memmap(blob_path, dtype=np.uint8, mode="r") if offsets[-1] else np.empty(0, dtype=np.uint8)
+        return cls(blob, offsets)
+
+    @staticmethod
+    def write(strings: Iterable[Optional[str]], blob_path: str, offsets_path: str):
+        """Stream strings into blob_path and their offsets into offsets_path (None is stored as "").
+        Both files are written to temporary siblings first; the offsets are renamed into place last."""
+        offsets = [0]
+        with open(f"{blob_path}.tmp", "wb") as f:
+            for string in strings:
+                data = (string or "").encode("utf-8")
+                f.write(data)
+                offsets.append(offsets[-1] + len(data))
+            f.flush()
+            os.fsync(f.fileno())
+        with open(f"{offsets_path}.tmp", "wb") as f:
+            np.save(f, np.array(offsets, dtype=np.int64))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{blob_path}.tmp", blob_path)
+        os.replace(f"{offsets_path}.tmp", offsets_path)
+
+    @staticmethod
+    def extend(strings: Iterable[Optional[str]], blob_path: str, offsets_path: str):
+        """Append strings to a store written by write(), in place: only the new bytes and offsets are written.
+        The offsets go last, so an interrupted append leaves the stored strings unchanged."""
+        end = int(np.load(offsets_path, mmap_mode="r")[-1])
+        offsets = []
+        with open(blob_path, "r+b") as f:
+            f.seek(end)
+            for string in strings:
+                data = (string or "").encode("utf-8")
+                f.write(data)
+                end += len(data)
+                offsets.append(end)
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+        append_npy(offsets_path, np.array(offsets, dtype=np.int64))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1 + len(self.extra)
+
+    def __getitem__(self, i: int) -> str:
+        num_stored = len(self.offsets) - 1
+        if i < 0:
+            i += len(self)
+        if i >= num_stored:
+            return self.extra[i - num_stored]
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self.blob[start:end].tobytes().decode("utf-8")
+
+    def append(self, string: Optional[str]):
+        self.extra.append(string or "")
+
+
+def write_document_store(documents: List[dict], output_dir: str):
+    """Write every field of documents (as in documents.json) to its blob + offsets pair."""
+    for field in DOCUMENT_FIELDS:
+        StringStore.write((doc.get(field) for doc in documents), *store_paths(output_dir, field))
+
+
+def append_document_store(documents: List[dict], output_dir: str):
+    """Append documents to the blob + offsets pair of every field."""
+    for field in DOCUMENT_FIELDS:
+        StringStore.extend((doc.get(field) for doc in documents), *store_paths(output_dir, field))
+
+
+def document_store_exists(output_dir: str) -> bool:
+    """Whether every field's blob and offsets files exist, without opening them."""
+    return all(os.path.exists(path) for field in DOCUMENT_FIELDS for path in store_paths(output_dir, field))
+
+
+def open_document_store(output_dir: str, doc_path: Optional[str] = None) -> Optional[List[StringStore]]:
+    """Memory-map the stores of all fields, or return None if any is missing
+    or older than doc_path (a documents.json rewritten since the last conversion)."""
+    if not document_store_exists(output_dir):
+        return None
+    paths = [store_paths(output_dir, field) for field in DOCUMENT_FIELDS]
+    if doc_path and os.path.exists(doc_path):
+        written = min(os.path.getmtime(path) for pair in paths for path in pair)
+        if written < os.path.getmtime(doc_path):
+            print(f"Ignoring document store in {output_dir}: older than {doc_path}")
+            return None
+    return [StringStore.open(*pair) for pair in paths]
+
+
+def convert_documents_json(doc_path: str, output_dir: Optional[str] = None):
+    """Convert an existing documents.json into the memory-mapped document store."""
+    output_dir = output_dir or os.path.dirname(doc_path)
+    with open(doc_path, 'r', encoding='utf-8') as f:
+        documents = json.load(f)
+    write_document_store(documents, output_dir)
+    print(f"Converted {len(documents)} documents from {doc_path} to {output_dir}")
+
+
+if __name__ == "__main__":
+    convert_documents_json("datas/db/documents.json")
@@ -0,0 +1,204 @@
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import tiktoken
+from openai import OpenAI
+from dotenv import load_dotenv
+
+from caching import LRUCache, text_hash
+
+load_dotenv()
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+EMBEDDING_MODEL = "text-embedding-ada-002"
+# Set EMBEDDING_CACHE_PATH to an empty string to keep the cache in memory only
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "datas/cache/embeddings.sqlite")
+EMBEDDING_DIMENSIONS = 1536
+# Embeddings are kept as float64 arrays (12 KB each); the in-memory cache is sized by EMBEDDING_CACHE_MB
+# unless EMBEDDING_CACHE_SIZE sets an entry count
+EMBEDDING_CACHE_MB = float(os.getenv("EMBEDDING_CACHE_MB", "48"))
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE",
+                                     str(int(EMBEDDING_CACHE_MB * 2 ** 20) // (EMBEDDING_DIMENSIONS * 8))))
+# Per-request limits of the embeddings endpoint, and how many batch requests run at once
+MAX_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "250000"))
+MAX_BATCH_ITEMS = 2048
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+
+
+@lru_cache(maxsize=None)
+def get_encoding() -> tiktoken.Encoding:
+    """Shared tokenizer for text-embedding-ada-002."""
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens_batch(texts: List[str], num_threads: int = 8) -> List[int]:
+    """Count tokens of many texts, tokenizing them in parallel."""
+    return [len(tokens) for tokens in get_encoding().encode_ordinary_batch(texts, num_threads=num_threads)]
+
+
+def as_embedding(values) -> np.ndarray:
+    """Read-only float64 array of an embedding; float64 keeps the API's values bit-for-bit."""
+    embedding = np.asarray(values, dtype=np.float64)
+    embedding.setflags(write=False)
+    return embedding
+
+
+def pack_batches(token_counts: List[int], max_tokens: int = MAX_BATCH_TOKENS,
+                 max_items: int = MAX_BATCH_ITEMS) -> List[List[int]]:
+    """Greedily group text indices into batches under the per-request token and item limits."""
+    batches, current, current_tokens = [], [], 0
+    for i, tokens in enumerate(token_counts):
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+class EmbeddingStore:
+    def __init__(self, path: str):
+        """On-disk embedding store keyed by (model, sha256 of text)."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, sha256 TEXT NOT NULL, vector BLOB NOT NULL, "
+                "PRIMARY KEY (model, sha256))"
+            )
+
+    def get(self, model: str, digest: str) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector FROM embeddings WHERE model = ? AND sha256 = ?", (model, digest)
+            ).fetchone()
+        if row is None:
+            return None
+        return np.frombuffer(row[0], dtype=np.float64)
+
+    def put(self, model: str, digest: str, embedding: np.ndarray):
+        self.put_many(model, [(digest, embedding)])
+
+    def put_many(self, model: str, items: List[Tuple[str, np.ndarray]]):
+        """Insert (digest, embedding) pairs in a single transaction."""
+        rows = [(model, digest, np.asarray(embedding, dtype=np.float64).tobytes()) for digest, embedding in items]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, sha256, vector) VALUES (?, ?, ?)", rows
+            )
+
+
+class EmbeddingCache:
+    def __init__(self, path: Optional[str] = EMBEDDING_CACHE_PATH, maxsize: int = EMBEDDING_CACHE_SIZE):
+        """In-memory LRU in front of an optional on-disk store."""
+        self.memory = LRUCache(maxsize)
+        self.store = EmbeddingStore(path) if path else None
+        self.disk_hits = 0
+        self.api_calls = 0
+
+    def get_embedding(self, text: str, model: str = EMBEDDING_MODEL) -> np.ndarray:
+        """Return the embedding for text, calling the API only on a cache miss."""
+        key = (model, text_hash(text, normalize=False))
+        embedding = self.memory.get(key)
+        if embedding is not None:
+            return embedding
+
+        if self.store is not None:
+            embedding = self.store.get(*key)
+            if embedding is not None:
+                self.disk_hits += 1
+                self.memory.put(key, embedding)
+                return embedding
+
+        self.api_calls += 1
+        response = client.embeddings.create(model=model, input=text)
+        embedding = as_embedding(response.data[0].embedding)
+        if self.store is not None:
+            self.store.put(*key, embedding)
+        self.memory.put(key, embedding)
+        return embedding
+
+    def get_embeddings(self, texts: List[str], model: str = EMBEDDING_MODEL,
+                       token_counts: Optional[List[int]] = None,
+                       concurrency: int = EMBEDDING_CONCURRENCY) -> List[np.ndarray]:
+        """Embed many texts: cached ones are served locally, the rest are packed into
+        batched requests of which up to `concurrency` run at once."""
+        keys = [(model, text_hash(text, normalize=False)) for text in texts]
+        found: Dict[tuple, np.ndarray] = {}
+        missing: Dict[tuple, int] = {}  # key -> index of first text with that key
+        for i, key in enumerate(keys):
+            if key in found or key in missing:
+                continue
+            embedding = self.memory.get(key)
+            if embedding is None and self.store is not None:
+                embedding = self.store.get(*key)
+                if embedding is not None:
+                    self.disk_hits += 1
+                    self.memory.put(key, embedding)
+            if embedding is None:
+                missing[key] = i
+            else:
+                found[key] = embedding
+
+        if missing:
+            missing_keys = list(missing)
+            missing_texts = [texts[missing[key]] for key in missing_keys]
+            if token_counts is None:
+                missing_counts = count_tokens_batch(missing_texts)
+            else:
+                missing_counts = [token_counts[missing[key]] for key in missing_keys]
+
+            def embed_batch(batch: List[int]) -> List[np.ndarray]:
+                response = client.embeddings.create(model=model, input=[missing_texts[i] for i in batch])
+                return [as_embedding(item.embedding) for item in sorted(response.data, key=lambda item: item.index)]
+
+            batches = pack_batches(missing_counts)
+            with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(batches)))) as pool:
+                for batch, embeddings in zip(batches, pool.map(embed_batch, batches)):
+                    self.api_calls += 1
+                    batch_keys = [missing_keys[i] for i in batch]
+                    if self.store is not None:
+                        self.store.put_many(model, [(key[1], embedding) for key, embedding in zip(batch_keys, embeddings)])
+                    for key, embedding in zip(batch_keys, embeddings):
+                        self.memory.put(key, embedding)
+                        found[key] = embedding
+
+        return [found[key] for key in keys]
+
+    def info(self) -> Dict[str, float]:
+        """Return memory hit/miss counters, disk hits and API calls."""
+        return {**self.memory.info(), "disk_hits": self.disk_hits, "api_calls": self.api_calls}
+
+
+_shared_cache: Optional[EmbeddingCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Return the process-wide embedding cache, opening the store on first use."""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_lock:
+            if _shared_cache is None:
+                _shared_cache = EmbeddingCache()
+    return _shared_cache
+
+
+def get_embedding(text: str, model: str = EMBEDDING_MODEL) -> np.ndarray:
+    """Get embedding vector for input text, served from cache when possible."""
+    return get_embedding_cache().get_embedding(text, model)
+
+
+def get_embeddings(texts: List[str], model: str = EMBEDDING_MODEL,
+                   token_counts: Optional[List[int]] = None) -> List[np.ndarray]:
+    """Get embeddings for many texts with batched, cached requests."""
+    return get_embedding_cache().get_embeddings(texts, model, token_counts=token_counts)
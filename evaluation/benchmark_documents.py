@@ -0,0 +1,78 @@
+"""Startup time and memory of documents.json versus the memory-mapped document store.
+
+Run from the repository root:
+    python -m evaluation.benchmark_documents --sizes 1000 10000 100000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from document_store import open_document_store, write_document_store
+
+
+def random_documents(n: int, words: int = 300, seed: int = 0):
+    """Front-matter sized documents with a one-sentence main point each."""
+    rng = np.random.default_rng(seed)
+    vocabulary = [f"word{i}" for i in range(5000)]
+    return [{"filename": f"{i}.txt",
+             "content": " ".join(rng.choice(vocabulary, words)),
+             "main_point": " ".join(rng.choice(vocabulary, 20))} for i in range(n)]
+
+
+def measure(load):
+    """(seconds, peak MB of Python allocations) of load()."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = load()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak / 1e6
+
+
+def load_json(doc_path: str):
+    """What RAGSystem did before the document store: parse everything up front."""
+    with open(doc_path, 'r', encoding='utf-8') as f:
+        doc_data = json.load(f)
+    return [doc["content"] for doc in doc_data], [doc.get("main_point") for doc in doc_data]
+
+
+def benchmark(n: int, k: int):
+    """Load n documents both ways, then fetch k of them as a retrieval would."""
+    documents = random_documents(n)
+    with tempfile.TemporaryDirectory() as tmp:
+        doc_path = os.path.join(tmp, "documents.json")
+        with open(doc_path, 'w', encoding='utf-8') as f:
+            json.dump(documents, f)
+        write_document_store(documents, tmp)
+        del documents
+
+        print(f"\n--- n={n} ({os.path.getsize(doc_path) / 1e6:.1f} MB of JSON) ---")
+        print(f"{'format':<16} {'startup (ms)':>13} {'peak MB':>9} {f'fetch {k} (ms)':>13}")
+        for name, load in (("documents.json", lambda: load_json(doc_path)),
+                           ("document store", lambda: open_document_store(tmp))):
+            (contents, main_points), elapsed, peak = measure(load)
+            ids = np.random.default_rng(1).choice(len(contents), k, replace=False)
+            start = time.perf_counter()
+            _ = [(contents[int(i)], main_points[int(i)]) for i in ids]
+            fetch_ms = (time.perf_counter() - start) * 1000
+            print(f"{name:<16} {elapsed * 1000:>13.1f} {peak:>9.1f} {fetch_ms:>13.3f}")
+            del contents, main_points
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+    for n in args.sizes:
+        benchmark(n, args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""Retrieval latency/memory benchmark on synthetic ada-002 sized vectors.
+
+Run from the repository root:
+    python -m evaluation.benchmark_retrieval --sizes 1000 10000 100000
+    python -m evaluation.benchmark_retrieval --sizes 10000 --chunks 4 --long-fraction 0.3
+    python -m evaluation.benchmark_retrieval --sizes 100000 --quantize
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, List
+
+import numpy as np
+
+from vector_search import AGGREGATIONS, IVFIndex, aggregate_hits, normalize_rows, top_k_indices
+from vector_store import QUANTIZATIONS, RESCORE_FACTOR, QuantizedVectors
+
+DIM = 1536
+
+
+def random_corpus(n: int, dim: int = DIM, seed: int = 0) -> np.ndarray:
+    """Clustered random vectors, roughly mimicking topical structure in real embeddings."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, n // 100), dim))
+    vectors = centers[rng.integers(len(centers), size=n)] + 0.5 * rng.normal(size=(n, dim))
+    return vectors
+
+
+def time_queries(search: Callable[[np.ndarray], np.ndarray], queries: np.ndarray) -> float:
+    """Mean latency per query in ms."""
+    start = time.perf_counter()
+    for query in queries:
+        search(query)
+    return (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def list_memory_mb(rows: List[List[float]]) -> float:
+    """Approximate size of a list of lists of Python floats."""
+    if not rows:
+        return 0.0
+    per_row = sys.getsizeof(rows[0]) + sum(sys.getsizeof(x) for x in rows[0])
+    return (sys.getsizeof(rows) + per_row * len(rows)) / 1e6
+
+
+def benchmark_exact(n: int, k: int, num_queries: int):
+    """Compare list + cosine_similarity + argsort with the normalized float32 matrix."""
+    vectors = random_corpus(n)
+    queries = random_corpus(num_queries, seed=1)
+    matrix = normalize_rows(vectors)
+
+    def matrix_search(query):
+        return top_k_indices(matrix @ normalize_rows(query), k)
+
+    print(f"\n--- n={n} ---")
+    try:
+        from sklearn.metrics.pairwise import cosine_similarity
+        rows = vectors.tolist()
+
+        def list_search(query):
+            similarities = cosine_similarity([query.tolist()], rows)[0]
+            return np.argsort(similarities)[-k:][::-1]
+
+        print(f"{'list + cosine_similarity':<28} {time_queries(list_search, queries):>9.2f} ms/query  "
+              f"{list_memory_mb(rows):>9.1f} MB")
+        del rows
+    except ImportError:
+        print("scikit-learn not installed; skipping the list-based baseline")
+    print(f"{'float32 matrix + argpartition':<28} {time_queries(matrix_search, queries):>9.2f} ms/query  "
+          f"{matrix.nbytes / 1e6:>9.1f} MB")
+
+
+def recall_at_k(approx: List[np.ndarray], exact: List[np.ndarray]) -> float:
+    """Fraction of exact top-k ids recovered by the approximate search."""
+    return float(np.mean([len(np.intersect1d(a, e)) / len(e) for a, e in zip(approx, exact)]))
+
+
+def benchmark_ann(n: int, k: int, num_queries: int, nprobes: List[int]):
+    """Recall/latency trade-off of the IVF index against exact search."""
+    matrix = normalize_rows(random_corpus(n))
+    queries = normalize_rows(random_corpus(num_queries, seed=1))
+
+    start = time.perf_counter()
+    index = IVFIndex.build(matrix)
+    build_time = time.perf_counter() - start
+
+    exact = [top_k_indices(matrix @ q, k) for q in queries]
+    exact_ms = time_queries(lambda q: top_k_indices(matrix @ q, k), queries)
+    print(f"\n--- IVF n={n}: {len(index.centroids)} lists, built in {build_time:.1f}s ---")
+    print(f"{'exact':<16} {exact_ms:>9.2f} ms/query  recall@{k}=1.000")
+    for nprobe in nprobes:
+        approx = [index.search(matrix, q, k, nprobe)[0] for q in queries]
+        ann_ms = time_queries(lambda q: index.search(matrix, q, k, nprobe), queries)
+        print(f"{f'nprobe={nprobe}':<16} {ann_ms:>9.2f} ms/query  recall@{k}={recall_at_k(approx, exact):.3f}")
+
+
+def chunked_corpus(n: int, chunks: int, long_fraction: float, seed: int = 0):
+    """Document-level vectors plus a chunked variant in which a long_fraction of the documents
+    have `chunks` vectors each (drifting around the document vector), with the row -> document map."""
+    rng = np.random.default_rng(seed)
+    documents = random_corpus(n, seed=seed)
+    counts = np.where(rng.random(n) < long_fraction, chunks, 1)
+    chunk_doc = np.repeat(np.arange(n), counts)
+    chunk_vectors = documents[chunk_doc] + 0.5 * rng.normal(size=(len(chunk_doc), documents.shape[1]))
+    # Single-chunk documents keep their document vector
+    single = np.repeat(counts == 1, counts)
+    chunk_vectors[single] = documents[chunk_doc[single]]
+    return normalize_rows(documents), normalize_rows(chunk_vectors), chunk_doc
+
+
+def benchmark_chunked(n: int, k: int, num_queries: int, chunks: int, long_fraction: float, nprobe: int):
+    """Index size and latency of a chunked index (with per-document aggregation) against the non-chunked one."""
+    documents, chunk_vectors, chunk_doc = chunked_corpus(n, chunks, long_fraction)
+    queries = normalize_rows(random_corpus(num_queries, seed=1))
+    num_hits = k * 4  # RAGSystem gathers CHUNK_CANDIDATES hits per requested document
+
+    print(f"\n--- chunked n={n}: {len(chunk_vectors)} chunks ({long_fraction:.0%} of documents in {chunks} chunks) ---")
+    print(f"{'index':<22} {'vectors':>9} {'MB':>9} {'exact ms/q':>11} {f'nprobe={nprobe} ms/q':>16}")
+    document_index = IVFIndex.build(documents)
+    exact_ms = time_queries(lambda q: top_k_indices(documents @ q, k), queries)
+    ann_ms = time_queries(lambda q: document_index.search(documents, q, k, nprobe), queries)
+    print(f"{'documents':<22} {len(documents):>9} {documents.nbytes / 1e6:>9.1f} {exact_ms:>11.2f} {ann_ms:>16.2f}")
+
+    chunk_index = IVFIndex.build(chunk_vectors)
+    for aggregation in AGGREGATIONS:
+        def exact_search(query):
+            similarities = chunk_vectors @ query
+            ids = top_k_indices(similarities, num_hits)
+            return aggregate_hits(ids, similarities[ids], chunk_doc, k, aggregation)
+
+        def ann_search(query):
+            ids, scores = chunk_index.search(chunk_vectors, query, num_hits, nprobe)
+            return aggregate_hits(ids, scores, chunk_doc, k, aggregation)
+
+        size_mb = (chunk_vectors.nbytes + chunk_doc.nbytes) / 1e6
+        print(f"{f'chunks ({aggregation})':<22} {len(chunk_vectors):>9} {size_mb:>9.1f} "
+              f"{time_queries(exact_search, queries):>11.2f} {time_queries(ann_search, queries):>16.2f}")
+
+
+def benchmark_quantized(n: int, k: int, num_queries: int):
+    """Memory per vector, latency and recall@k of compact codes, with and without exact rescoring
+    against the full-precision vectors memory-mapped from disk."""
+    vectors = random_corpus(n)
+    queries = normalize_rows(random_corpus(num_queries, seed=1))
+    matrix = normalize_rows(vectors)
+    exact = [top_k_indices(matrix @ q, k) for q in queries]
+    exact_ms = time_queries(lambda q: top_k_indices(matrix @ q, k), queries)
+
+    print(f"\n--- quantized n={n} (vectors.npy is float64: {vectors.itemsize * DIM} bytes/vector) ---")
+    print(f"{'format':<20} {'bytes/vec':>10} {'vs float64':>11} {'ms/query':>9} {f'recall@{k}':>10}")
+    print(f"{'float32':<20} {matrix.itemsize * DIM:>10} {vectors.itemsize / matrix.itemsize:>10.0f}x "
+          f"{exact_ms:>9.2f} {1.0:>10.3f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "vectors.npy")
+        np.save(path, vectors)
+        del vectors
+        full = np.load(path, mmap_mode="r")
+        for dtype in QUANTIZATIONS:
+            store = QuantizedVectors.quantize(full, dtype)
+            bytes_per_vector = store.nbytes / n
+
+            def compact_search(query):
+                return top_k_indices(store @ query, k)
+
+            def rescored_search(query):
+                shortlist = top_k_indices(store @ query, k * RESCORE_FACTOR)
+                return shortlist[top_k_indices(store.rescore(shortlist, query), k)]
+
+            for name, search in ((dtype, compact_search), (f"{dtype} + rescore", rescored_search)):
+                approx = [search(q) for q in queries]
+                print(f"{name:<20} {bytes_per_vector:>10.0f} {full.itemsize * DIM / bytes_per_vector:>10.1f}x "
+                      f"{time_queries(search, queries):>9.2f} {recall_at_k(approx, exact):>10.3f}")
+        del full
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--nprobes", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--chunks", type=int, default=0,
+                        help="Chunks per long document; compares a chunked index with the document-level one")
+    parser.add_argument("--long-fraction", type=float, default=0.3)
+    parser.add_argument("--quantize", action="store_true",
+                        help="Compare float16/int8 codes (with exact rescoring) against float32")
+    args = parser.parse_args()
+
+    if args.quantize:
+        for n in args.sizes:
+            benchmark_quantized(n, args.k, args.queries)
+        return
+
+    if args.chunks:
+        for n in args.sizes:
+            benchmark_chunked(n, args.k, args.queries, args.chunks, args.long_fraction, max(args.nprobes))
+        return
+
+    for n in args.sizes:
+        benchmark_exact(n, args.k, args.queries)
+    for n in args.sizes:
+        benchmark_ann(n, args.k, args.queries, args.nprobes)
+
+
+if __name__ == "__main__":
+    main()
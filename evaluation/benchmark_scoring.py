@@ -0,0 +1,134 @@
+"""Latency benchmark for the pitch scoring model.
+
+Run from the repository root:
+    python -m evaluation.benchmark_scoring
+"""
+import argparse
+import os
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+from scoring_model_inference import ScoringModel, get_scoring_model
+
+BENCHMARK_DIR = "evaluation/benchmark_set"
+PITCH_DIR = "evaluation/generated_pitch"
+MODES = ["general", "investor", "conference"]
+
+
+def load_pairs(benchmark_dir: str = BENCHMARK_DIR, pitch_dir: str = PITCH_DIR) -> List[Tuple[str, str]]:
+    """Load (abstract, pitch) pairs for every benchmark abstract and mode."""
+    pairs = []
+    for filename in sorted(os.listdir(benchmark_dir)):
+        if not filename.endswith(".txt"):
+            continue
+        base_name = os.path.splitext(filename)[0]
+        with open(os.path.join(benchmark_dir, filename), 'r', encoding='utf-8') as f:
+            abstract = f.read().strip()
+        for mode in MODES:
+            pitch_path = os.path.join(pitch_dir, mode, f"{base_name}_{mode}.txt")
+            if os.path.exists(pitch_path):
+                with open(pitch_path, 'r', encoding='utf-8') as f:
+                    pairs.append((abstract, f.read().strip()))
+    return pairs
+
+
+def report(name: str, timings: List[float]):
+    """Print latency statistics in milliseconds."""
+    ms = np.array(timings) * 1000
+    print(f"{name:<28} n={len(ms):<4} mean={ms.mean():>9.1f}ms  p50={np.percentile(ms, 50):>9.1f}ms  "
+          f"p95={np.percentile(ms, 95):>9.1f}ms")
+
+
+def benchmark_repeated(pairs: List[Tuple[str, str]], cold_runs: int):
+    """Compare rebuilding the model per score against the shared instance."""
+    # Before: every call rebuilds tokenizer, towers and checkpoint (old score_pitch behaviour)
+    cold = []
+    for abstract, pitch in pairs[:cold_runs]:
+        start = time.perf_counter()
+        ScoringModel().score(abstract, pitch)
+        cold.append(time.perf_counter() - start)
+
+    # After: one load, then repeated scoring
+    start = time.perf_counter()
+    model = get_scoring_model()
+    load_time = time.perf_counter() - start
+
+    warm = []
+    for abstract, pitch in pairs:
+        start = time.perf_counter()
+        model.score(abstract, pitch)
+        warm.append(time.perf_counter() - start)
+
+    print("\n=== Repeated scoring ===")
+    report("rebuild per call (before)", cold)
+    print(f"{'shared model load (once)':<28} {load_time * 1000:.1f}ms")
+    report("shared model (after)", warm)
+    print(f"Speedup per score: {np.mean(cold) / np.mean(warm):.1f}x")
+
+
+def benchmark_batched(pairs: List[Tuple[str, str]], batch_sizes: List[int]):
+    """Compare one-pair-per-forward scoring with the batched API, and both with the trained forward pass."""
+    model = get_scoring_model()
+    abstracts = [a for a, _ in pairs]
+    pitches = [p for _, p in pairs]
+
+    start = time.perf_counter()
+    single = [model.score(a, p) for a, p in pairs]
+    single_time = time.perf_counter() - start
+
+    # score() and score_pitches() share the tower routing; only the full forward pass can catch swapped inputs
+    reference = [model.score_reference(a, p) for a, p in pairs]
+    reference_dev = max(abs(s[k] - r[k]) for s, r in zip(single, reference) for k in s)
+
+    print("\n=== Batched scoring ===")
+    print(f"score() vs model(pitch, abstract): max |dev|={reference_dev:.2e}")
+    print(f"{'single pair per forward':<28} {len(pairs) / single_time:>8.1f} pairs/s")
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        batched = model.score_pitches(abstracts, pitches, batch_size=batch_size)
+        batch_time = time.perf_counter() - start
+
+        max_dev = max(abs(s[k] - b[k]) for s, b in zip(single, batched) for k in s)
+        print(f"{f'score_pitches(batch={batch_size})':<28} {len(pairs) / batch_time:>8.1f} pairs/s  "
+              f"speedup={single_time / batch_time:.1f}x  max |dev|={max_dev:.2e}")
+
+
+def benchmark_abstract_cache(pairs: List[Tuple[str, str]], attempts: int):
+    """Score several pitches per abstract, as self-reflection does, with and without the abstract cache."""
+    model = get_scoring_model()
+    model.abstract_cache.clear()
+
+    print("\n=== Abstract embedding cache ===")
+    for label, cache_size in [("cache disabled", 0), ("cache enabled", model.abstract_cache.maxsize or 1024)]:
+        model.abstract_cache.maxsize = cache_size
+        model.abstract_cache.clear()
+        timings = []
+        for _ in range(attempts):
+            for abstract, pitch in pairs:
+                start = time.perf_counter()
+                model.score(abstract, pitch)
+                timings.append(time.perf_counter() - start)
+        report(label, timings)
+        info = model.cache_info()
+        print(f"{'':<28} hits={info['hits']} misses={info['misses']} hit_rate={info['hit_rate']:.0%} "
+              f"(abstract-tower passes avoided)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cold-runs", type=int, default=3, help="number of rebuild-per-call scores to time")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--attempts", type=int, default=3, help="repeated scores per pair for the cache benchmark")
+    args = parser.parse_args()
+
+    pairs = load_pairs()
+    print(f"Loaded {len(pairs)} (abstract, pitch) pairs")
+    benchmark_repeated(pairs, args.cold_runs)
+    benchmark_batched(pairs, args.batch_sizes)
+    benchmark_abstract_cache(pairs, args.attempts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Throughput and agreement of the single-pass segmentation engine against the previous
+multi-pass extract_front_matter.
+
+Run from the repository root:
+    python -m evaluation.benchmark_segmentation --folder datas/documents
+"""
+import argparse
+import json
+import os
+import re
+import time
+from typing import Callable, List, Tuple
+
+from data_preprocessing.extract_front_matter import extract_front_matter
+from data_preprocessing.segmentation import segment
+
+LEGACY_ABSTRACT_PATTERNS = [
+    r'\nAbstract[\n\s]*',
+    r'\nABSTRACT[\n\s]*',
+    r'\n[0-9]+\.?\s*Abstract[\n\s]*',
+    r'\nAbstract[:.]\s*',
+    r'\n[0-9]+\.?\s*ABSTRACT[\n\s]*'
+]
+LEGACY_SECTION_PATTERNS = [
+    r'\n[0-9]+\.?\s*Introduction\s*\n',
+    r'\nIntroduction\s*\n',
+    r'\n[0-9]+\.?\s*Background\s*\n',
+    r'\n[0-9]+\.?\s*Related Work\s*\n',
+    r'\nKeywords[:.]',
+    r'\n[0-9]+\.\s'
+]
+
+
+def legacy_extract_front_matter(content: str, section_patterns: List[str] = LEGACY_SECTION_PATTERNS) -> Tuple[str, str]:
+    """The previous implementation: one re.search per pattern, then re.split and more searches."""
+    abstract_start = None
+    abstract_pattern_used = None
+    for pattern in LEGACY_ABSTRACT_PATTERNS:
+        match = re.search(pattern, content)
+        if match:
+            abstract_start = match.start()
+            abstract_pattern_used = pattern
+            break
+    if abstract_start is None:
+        return content, ""
+
+    front_matter = content[:abstract_start].strip()
+    abstract_text = ""
+    abstract_match = re.split(abstract_pattern_used, content[abstract_start:], maxsplit=1)
+    if len(abstract_match) > 1:
+        abstract_text = abstract_match[1]
+        min_pos = len(abstract_text)
+        for pattern in section_patterns:
+            match = re.search(pattern, abstract_text)
+            if match and match.start() < min_pos:
+                min_pos = match.start()
+        abstract_text = abstract_text[:min_pos].strip()
+    return front_matter, abstract_text
+
+
+# The last two section patterns used to be concatenated by a missing comma
+BUGGY_SECTION_PATTERNS = LEGACY_SECTION_PATTERNS[:-1] + [r'\n[0-9]+\.\s' r'\n[0-9]+\.\s']
+
+
+def load_documents(folder: str) -> List[str]:
+    """Text documents from folder, or full-text stand-ins rebuilt from datas/db if it does not exist."""
+    if os.path.isdir(folder):
+        documents = []
+        for filename in sorted(os.listdir(folder)):
+            if filename.endswith(".txt"):
+                with open(os.path.join(folder, filename), 'r', encoding='utf-8') as f:
+                    documents.append(f.read())
+        return documents
+
+    print(f"{folder} not found; rebuilding documents from datas/db/documents.json")
+    with open("datas/db/documents.json", 'r', encoding='utf-8') as f:
+        doc_data = json.load(f)
+    documents = []
+    for doc in doc_data:
+        front_matter, _, abstract = doc["content"].replace("=== FRONT MATTER ===", "").partition("=== ABSTRACT ===")
+        documents.append(f"{front_matter.strip()}\nAbstract\n{abstract.strip()}\n1 Introduction\n"
+                         + "Body text of the paper.\n" * 200)
+    return documents
+
+
+def time_segmentation(split: Callable[[str], object], documents: List[str], repeat: int) -> float:
+    """Documents per second."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for document in documents:
+            split(document)
+    return repeat * len(documents) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--folder", default="datas/documents")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    documents = load_documents(args.folder)
+    print(f"{len(documents)} documents, {sum(map(len, documents)) / max(len(documents), 1) / 1000:.1f}k chars on average")
+
+    fixed = [legacy_extract_front_matter(d) for d in documents]
+    buggy = [legacy_extract_front_matter(d, BUGGY_SECTION_PATTERNS) for d in documents]
+    engine = [extract_front_matter(d) for d in documents]
+    print(f"Agreement with the legacy patterns: {sum(a == b for a, b in zip(engine, fixed))}/{len(documents)}")
+    print(f"Abstracts changed by the concatenation fix: {sum(a != b for a, b in zip(fixed, buggy))}/{len(documents)}")
+
+    print(f"\n{'implementation':<24} {'docs/sec':>10} {'1M docs (min)':>14}")
+    for name, split in (("legacy multi-pass", lambda d: legacy_extract_front_matter(d, BUGGY_SECTION_PATTERNS)),
+                        ("single-pass engine", extract_front_matter),
+                        ("all sections", segment)):
+        rate = time_segmentation(split, documents, args.repeat)
+        print(f"{name:<24} {rate:>10.0f} {1e6 / rate / 60:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -27,36 +27,18 @@ def generate_and_save_pitches():
     # Read evaluation samples
     samples = read_evaluation_samples()
     
-    # Generate pitches for each sample
+    # Generate pitches for each sample; retrieval and context are shared across modes
     for filename, content in samples:
         base_name = os.path.splitext(filename)[0]
         
-        # Generate and save general version
-        general_version = rag.generate_storytelling_output(
+        versions = rag.generate_all_modes(
             user_abstract=content,
-            mode="general",
+            modes=["general", "investor", "conference"],
             k=3
         )
-        with open(f"generated_pitch/general/{base_name}_general.txt", 'w', encoding='utf-8') as f:
-            f.write(general_version)
-        
-        # Generate and save investor version
-        investor_version = rag.generate_storytelling_output(
-            user_abstract=content,
-            mode="investor",
-            k=3
-        )
-        with open(f"generated_pitch/investor/{base_name}_investor.txt", 'w', encoding='utf-8') as f:
-            f.write(investor_version)
-        
-        # Generate and save conference version
-        conference_version = rag.generate_storytelling_output(
-            user_abstract=content,
-            mode="conference",
-            k=3
-        )
-        with open(f"generated_pitch/conference/{base_name}_conference.txt", 'w', encoding='utf-8') as f:
-            f.write(conference_version)
+        for mode, version in versions.items():
+            with open(f"generated_pitch/{mode}/{base_name}_{mode}.txt", 'w', encoding='utf-8') as f:
+                f.write(version)
         
         print(f"✓ Generated pitches for {filename}")
 
@@ -0,0 +1,87 @@
+"""Parity and latency/memory check of a scoring backend against the fp32 model.
+
+Run from the repository root:
+    python -m evaluation.scoring_backend_parity --backend int8
+"""
+import argparse
+import io
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+import torch
+
+from scoring_model_inference import BACKENDS, CATEGORIES, ScoringModel
+from evaluation.benchmark_scoring import load_pairs, PITCH_DIR
+
+BASE_PITCH_DIR = "evaluation/base_pitch"
+
+
+def model_size_mb(module: torch.nn.Module) -> float:
+    """Serialized size of a module's weights in MB."""
+    buffer = io.BytesIO()
+    if isinstance(module, torch.jit.ScriptModule):
+        torch.jit.save(module, buffer)
+    else:
+        torch.save(module.state_dict(), buffer)
+    return buffer.tell() / 1e6
+
+
+def scorer_size_mb(scorer: ScoringModel) -> float:
+    """Total serialized size of both towers and the MLP head."""
+    model = scorer.model
+    return sum(model_size_mb(m) for m in (model.transformer_abstract, model.transformer_pitch, model.mlp))
+
+
+def time_scoring(scorer: ScoringModel, pairs: List[Tuple[str, str]]) -> Tuple[List[Dict[str, float]], float]:
+    """Score pairs one at a time; return scores and mean latency in ms."""
+    scores = []
+    start = time.perf_counter()
+    for abstract, pitch in pairs:
+        scores.append(scorer.score(abstract, pitch))
+    return scores, (time.perf_counter() - start) * 1000 / len(pairs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backend", choices=[b for b in BACKENDS if b != "fp32"], default="int8")
+    args = parser.parse_args()
+
+    pairs = load_pairs(pitch_dir=PITCH_DIR) + load_pairs(pitch_dir=BASE_PITCH_DIR)
+    print(f"Loaded {len(pairs)} (abstract, pitch) pairs from evaluation/benchmark_set")
+
+    # Cache disabled so both runs pay for the abstract tower
+    start = time.perf_counter()
+    reference = ScoringModel(device="cpu", abstract_cache_size=0, backend="fp32")
+    reference_load = time.perf_counter() - start
+    start = time.perf_counter()
+    candidate = ScoringModel(abstract_cache_size=0, backend=args.backend)
+    candidate_load = time.perf_counter() - start
+
+    reference_scores, reference_latency = time_scoring(reference, pairs)
+    forward_scores = [reference.score_reference(abstract, pitch) for abstract, pitch in pairs]
+    forward_deviation = max(abs(r[k] - f[k]) for r, f in zip(reference_scores, forward_scores) for k in CATEGORIES)
+    print(f"fp32 score() vs the trained model(pitch, abstract) forward: max |dev|={forward_deviation:.4f}")
+    candidate_scores, candidate_latency = time_scoring(candidate, pairs)
+
+    print(f"\n=== Parity: {args.backend} vs fp32 ===")
+    for category in CATEGORIES:
+        deviation = np.abs([r[category] - c[category] for r, c in zip(reference_scores, candidate_scores)])
+        print(f"{category:<12} max |dev|={deviation.max():.4f}  mean |dev|={deviation.mean():.4f}")
+    total_deviation = np.abs([sum(r.values()) - sum(c.values()) for r, c in zip(reference_scores, candidate_scores)])
+    print(f"{'total':<12} max |dev|={total_deviation.max():.4f}  (score range 4-20)")
+
+    # Batches of several sizes and lengths, the shapes the server actually sends
+    abstracts, pitches = zip(*pairs)
+    batched_scores = candidate.score_pitches(list(abstracts), list(pitches))
+    batched_deviation = max(abs(r[k] - b[k]) for r, b in zip(forward_scores, batched_scores) for k in CATEGORIES)
+    print(f"{'batched':<12} max |dev|={batched_deviation:.4f}  (score_pitches vs the trained forward)")
+
+    print(f"\n=== Latency / memory ===")
+    print(f"{'backend':<12} {'load (s)':>10} {'ms/score':>10} {'weights (MB)':>14}")
+    print(f"{'fp32':<12} {reference_load:>10.1f} {reference_latency:>10.1f} {scorer_size_mb(reference):>14.1f}")
+    print(f"{args.backend:<12} {candidate_load:>10.1f} {candidate_latency:>10.1f} {scorer_size_mb(candidate):>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,36 @@ import { useState } from 'react';
 import FileUpload from '../components/FileUpload';
 import ResultsDisplay from '../components/ResultsDisplay';
 
+// Parse a text/event-stream body, calling onEvent with each event name and its JSON-decoded data
+async function readServerSentEvents(
+  body: ReadableStream<Uint8Array>,
+  onEvent: (event: string, data: unknown) => void
+) {
+  const reader = body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const frame = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let event = 'message';
+      let data = '';
+      for (const line of frame.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+      }
+      onEvent(event, data ? JSON.parse(data) : null);
+    }
+  }
+}
+
 export default function Home() {
   const [results, setResults] = useState<string>('');
   const [inputText, setInputText] = useState<string>('');
@@ -36,18 +66,34 @@ export default function Home() {
 
   const handleTextSubmit = async () => {
     try {
-      const response = await fetch('http://localhost:8000/run', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ input_data: inputText, mode }),
-      });
+      // Stream stage events and completion tokens as they are produced
+      const response = await fetch(
+        `http://localhost:8000/run/stream?mode=${encodeURIComponent(mode)}`,
+        {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ input_data: inputText }),
+        }
+      );
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         throw new Error('Failed to process text');
       }
 
-      const data = await response.json();
-      setResults(data.result);
+      setResults('Retrieving related work...');
+      let output = '';
+      await readServerSentEvents(response.body, (event, data) => {
+        if (event === 'retrieval') {
+          setResults('Summarizing related work...');
+        } else if (event === 'context') {
+          setResults('Writing...');
+        } else if (event === 'token') {
+          output += data as string;
+          setResults(output);
+        } else if (event === 'error') {
+          throw new Error(String(data));
+        }
+      });
     } catch (error) {
       console.error('Error processing text:', error);
       setResults('Error processing text. Please try again.');
@@ -0,0 +1,295 @@
+"""Streaming ingest: arXiv search (or a folder of PDFs) -> front matter -> embeddings and
+main points -> vector DB, with bounded queues between the stages.
+
+Run from the repository root:
+    python ingest.py --max-results 500
+    python ingest.py --pdf-folder arxiv_papers
+"""
+import argparse
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable, List, Optional
+
+from caching import text_hash
+from data_preprocessing.extract_arxiv import (CATEGORY, DOWNLOAD_CONCURRENCY, MAX_RESULTS, OUTPUT_DIR, QUERY,
+                                              YEAR_CUTOFF, PDFDownloader, fetch_arxiv_papers, pdf_filename)
+from data_preprocessing.extract_front_matter import (MAX_FRONT_MATTER_PAGES, extract_front_matter_from_pdf,
+                                                     format_front_matter)
+from data_preprocessing.pdf_utils import EXTRACTION_TIMEOUT, ProcessWorker
+from embeddings import EMBEDDING_CONCURRENCY, count_tokens_batch, get_embeddings
+from summaries import extract_main_points
+from word_embedding import VectorDBAppender, chunk_text
+
+DB_DIR = "datas/db"
+# Items buffered between two stages; a full queue blocks the stage upstream of it
+QUEUE_SIZE = 64
+# Documents per embeddings call, and new documents written to the vector DB at a time
+EMBED_BATCH_SIZE = 64
+FLUSH_EVERY = 50
+# Token limit of a document in a DB built without chunking; chunked DBs use their own chunk size
+MAX_TOKENS = 2000
+SUMMARY_CONCURRENCY = 4
+REPORT_INTERVAL = 10.0
+
+_DONE = object()  # End-of-stream marker passed down the queues
+
+
+class Stage:
+    def __init__(self, name: str, fn: Callable[[Any], Iterable], workers: int = 1,
+                 queue_size: int = QUEUE_SIZE, batch_size: int = 1, batch_wait: float = 0.5):
+        """Pipeline stage: `workers` threads take items from a bounded input queue, call fn and pass
+        everything it returns downstream (so a stage can drop or fan out items). With batch_size > 1,
+        fn receives lists of up to batch_size items, waiting at most batch_wait seconds to fill one."""
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.input: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.output: Optional[queue.Queue] = None
+        self.processed = 0
+        self.emitted = 0
+        self.failed = 0
+        self.busy = 0.0
+        self.max_depth = 0
+        self._lock = threading.Lock()
+        self._active = workers
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        self._threads = [threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+                         for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def _take(self) -> Optional[List]:
+        """Next batch of items, or None once the stream has ended."""
+        item = self.input.get()
+        if item is _DONE:
+            self.input.put(_DONE)  # Leave the marker for the sibling workers
+            return None
+        batch = [item]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            try:
+                item = self.input.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is _DONE:
+                self.input.put(_DONE)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._take()
+            if batch is None:
+                break
+            start = time.perf_counter()
+            try:
+                outputs = list(self.fn(batch if self.batch_size > 1 else batch[0]))
+            except Exception as e:
+                outputs = []
+                with self._lock:
+                    self.failed += len(batch)
+                print(f"✗ {self.name}: {type(e).__name__}: {e}")
+            with self._lock:
+                self.busy += time.perf_counter() - start
+                self.processed += len(batch)
+                self.emitted += len(outputs)
+            if self.output is not None:
+                for output in outputs:
+                    self.output.put(output)
+
+        # The last worker to finish ends the stream for the next stage
+        with self._lock:
+            self._active -= 1
+            last = self._active == 0
+        if last:
+            self.input.get_nowait()  # The marker left for siblings that have all exited
+            if self.output is not None:
+                self.output.put(_DONE)
+
+
+class Pipeline:
+    def __init__(self, stages: List[Stage]):
+        """Chain stages so each one's output queue is the next one's input queue."""
+        self.stages = stages
+        for upstream, downstream in zip(stages, stages[1:]):
+            upstream.output = downstream.input
+
+    def run(self, source: Iterable, report_interval: float = REPORT_INTERVAL):
+        """Feed source into the first stage and block until every stage has drained."""
+        start_time = time.perf_counter()
+        finished = threading.Event()
+
+        def monitor():
+            # Sample queue depths often; print progress every report_interval seconds
+            last_report = time.monotonic()
+            while not finished.wait(0.5):
+                for stage in self.stages:
+                    stage.max_depth = max(stage.max_depth, stage.input.qsize())
+                if time.monotonic() - last_report >= report_interval:
+                    last_report = time.monotonic()
+                    self.report(time.perf_counter() - start_time)
+
+        for stage in self.stages:
+            stage.start()
+        monitor_thread = threading.Thread(target=monitor, name="pipeline-monitor", daemon=True)
+        monitor_thread.start()
+        try:
+            for item in source:
+                self.stages[0].input.put(item)
+        finally:
+            self.stages[0].input.put(_DONE)
+            for stage in self.stages:
+                stage.join()
+            finished.set()
+            monitor_thread.join()
+        self.report(time.perf_counter() - start_time, final=True)
+
+    def report(self, elapsed: float, final: bool = False):
+        """Per-stage throughput, worker utilization and queue depth; the busiest stage is the bottleneck."""
+        print(f"\n{'=== Ingest summary' if final else '--- Progress'} after {elapsed:.1f}s ---")
+        print(f"{'stage':<12} {'workers':>7} {'done':>7} {'failed':>7} {'items/s':>8} {'busy':>6} {'queue':>6} {'max q':>6}")
+        for stage in self.stages:
+            utilization = stage.busy / max(elapsed * stage.workers, 1e-9)
+            print(f"{stage.name:<12} {stage.workers:>7} {stage.processed:>7} {stage.failed:>7} "
+                  f"{stage.processed / max(elapsed, 1e-9):>8.2f} {utilization:>6.0%} "
+                  f"{stage.input.qsize():>6} {stage.max_depth:>6}")
+        if final:
+            bottleneck = max(self.stages, key=lambda stage: stage.busy / stage.workers)
+            print(f"Bottleneck: {bottleneck.name}")
+
+
+def ingest(pdf_folder: Optional[str] = None, output_dir: str = DB_DIR, pdf_dir: str = OUTPUT_DIR,
+           query: str = QUERY, category: str = CATEGORY, max_results: int = MAX_RESULTS,
+           year_cutoff: int = YEAR_CUTOFF, max_pages: int = MAX_FRONT_MATTER_PAGES,
+           extract_workers: Optional[int] = None, timeout: float = EXTRACTION_TIMEOUT,
+           summarize: bool = True, report_interval: float = REPORT_INTERVAL):
+    """Stream papers into the vector DB in output_dir: download (unless pdf_folder is given) ->
+    front matter extraction in worker processes -> batched embeddings -> main points -> vector DB,
+    which is appended to in place every FLUSH_EVERY documents."""
+    database = VectorDBAppender(output_dir)
+    downloader = PDFDownloader(pdf_dir) if pdf_folder is None else None
+    pending_rows = []
+    workers: List[ProcessWorker] = []
+    local = threading.local()
+
+    def download(paper):
+        path = os.path.join(pdf_dir, pdf_filename(paper["title"]))
+        downloader.download(downloader.pdf_url(paper["arxiv_id"]), path)
+        return [path]
+
+    def extract(pdf_path):
+        # PDFs are parsed in a process per extract thread, so a pathological file can be killed
+        if not hasattr(local, "worker"):
+            local.worker = ProcessWorker()
+            workers.append(local.worker)
+        front_matter, abstract = local.worker.call(extract_front_matter_from_pdf, pdf_path, max_pages, timeout=timeout)
+        if not front_matter.strip() and not abstract:
+            raise ValueError(f"no text extracted from {os.path.basename(pdf_path)}")
+        content = format_front_matter(front_matter, abstract)
+        digest = text_hash(content, normalize=False)
+        if digest in database.entries:
+            return []
+        filename = f"{os.path.splitext(os.path.basename(pdf_path))[0]}_front_matter.txt"
+        return [(digest, {"filename": filename, "content": content})]
+
+    # Follow the DB's own chunking so chunk_doc.npy stays consistent; an unchunked DB drops long documents
+    chunking = database.chunking
+    max_tokens = chunking["max_tokens"] if chunking is not None else MAX_TOKENS
+
+    def embed(batch):
+        token_counts = count_tokens_batch([doc_entry["content"] for _, doc_entry in batch])
+        pieces = []  # (position in batch, text, token count or None)
+        for position, ((_, doc_entry), n) in enumerate(zip(batch, token_counts)):
+            if n <= max_tokens:
+                pieces.append((position, doc_entry["content"], n))
+            elif chunking is not None:
+                pieces.extend((position, text, None)
+                              for text in chunk_text(doc_entry["content"], max_tokens, chunking["overlap"]))
+            else:
+                print(f"Skipping {doc_entry['filename']}: {n} tokens (exceeds {max_tokens} limit)")
+        chunk_counts = iter(count_tokens_batch([text for _, text, n in pieces if n is None]))
+        pieces = [(position, text, next(chunk_counts) if n is None else n) for position, text, n in pieces]
+
+        embeddings = get_embeddings([text for _, text, _ in pieces], token_counts=[n for _, _, n in pieces])
+        vectors = {}  # position in batch -> one embedding per chunk, in order
+        for (position, _, _), embedding in zip(pieces, embeddings):
+            vectors.setdefault(position, []).append(embedding)
+        return [(batch[position][0], batch[position][1], vectors[position]) for position in sorted(vectors)]
+
+    def add_main_point(row):
+        # A failed summary must not drop the document; RAGSystem extracts missing main points on demand
+        try:
+            row[1]["main_point"] = extract_main_points(row[1]["content"])
+        except Exception as e:
+            print(f"✗ Could not summarize {row[1]['filename']}: {type(e).__name__}: {e}")
+        return [row]
+
+    def flush():
+        rows = pending_rows[:]
+        pending_rows.clear()
+        if rows:
+            added = database.append(rows)
+            print(f"✓ Added {added} documents to {output_dir}")
+
+    def write(row):
+        # The write stage has a single worker, so the batch needs no lock
+        pending_rows.append(row)
+        if len(pending_rows) >= FLUSH_EVERY:
+            flush()
+        return []
+
+    stages = []
+    if pdf_folder is None:
+        os.makedirs(pdf_dir, exist_ok=True)
+        stages.append(Stage("download", download, workers=DOWNLOAD_CONCURRENCY))
+        source = fetch_arxiv_papers(query, category, max_results, year_cutoff)
+    else:
+        source = sorted(os.path.join(pdf_folder, filename) for filename in os.listdir(pdf_folder)
+                        if filename.lower().endswith(".pdf"))
+    stages.append(Stage("extract", extract, workers=extract_workers or os.cpu_count() or 1))
+    stages.append(Stage("embed", embed, workers=EMBEDDING_CONCURRENCY, batch_size=EMBED_BATCH_SIZE))
+    if summarize:
+        stages.append(Stage("summarize", add_main_point, workers=SUMMARY_CONCURRENCY))
+    stages.append(Stage("write", write))
+
+    try:
+        Pipeline(stages).run(source, report_interval=report_interval)
+    finally:
+        for worker in workers:
+            worker.close()
+    flush()
+    database.finish()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf-folder", help="Ingest the PDFs in this folder instead of searching arXiv")
+    parser.add_argument("--output-dir", default=DB_DIR)
+    parser.add_argument("--pdf-dir", default=OUTPUT_DIR, help="Where downloaded PDFs are kept")
+    parser.add_argument("--query", default=QUERY)
+    parser.add_argument("--category", default=CATEGORY)
+    parser.add_argument("--max-results", type=int, default=MAX_RESULTS)
+    parser.add_argument("--year-cutoff", type=int, default=YEAR_CUTOFF)
+    parser.add_argument("--max-pages", type=int, default=MAX_FRONT_MATTER_PAGES)
+    parser.add_argument("--extract-workers", type=int, default=None)
+    parser.add_argument("--no-summaries", action="store_true")
+    args = parser.parse_args()
+
+    ingest(pdf_folder=args.pdf_folder, output_dir=args.output_dir, pdf_dir=args.pdf_dir, query=args.query,
+           category=args.category, max_results=args.max_results, year_cutoff=args.year_cutoff,
+           max_pages=args.max_pages, extract_workers=args.extract_workers, summarize=not args.no_summaries)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,34 @@
-from fastapi import FastAPI, Request, UploadFile, File, Form
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Request, UploadFile, File, Form, HTTPException, Query
+from fastapi.responses import HTMLResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
-from ragcot import RAGSystem
+from ragcot import RAGSystem, MODES
+from singleflight import SingleFlight
 from pydantic import BaseModel
+from typing import List
 import PyPDF2
 import io
+import os
+import asyncio
+import functools
+import json
+from concurrent.futures import ThreadPoolExecutor
 
+# Blocking pipeline calls running at once, and how many more may wait for a worker
+GENERATION_CONCURRENCY = int(os.getenv("GENERATION_CONCURRENCY", "16"))
+GENERATION_QUEUE_SIZE = int(os.getenv("GENERATION_QUEUE_SIZE", "64"))
 
 app = FastAPI()
 rag = RAGSystem()
 
+# The RAG pipeline and PDF parsing are synchronous; run them off the event loop
+executor = ThreadPoolExecutor(max_workers=GENERATION_CONCURRENCY, thread_name_prefix="generation")
+pending_jobs = 0  # Only touched from the event loop thread
+# Identical concurrent generations share one pipeline run
+generations = SingleFlight()
+
 # Serve static files (like script.js)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -30,42 +47,152 @@ templates = Jinja2Templates(directory="templates")
 class InputText(BaseModel):
     input_data: str
 
+def admit_job():
+    """Reserve a pipeline slot, or answer 503 when the queue is full."""
+    global pending_jobs
+    if pending_jobs >= GENERATION_CONCURRENCY + GENERATION_QUEUE_SIZE:
+        raise HTTPException(status_code=503, detail="Server is busy, please retry shortly.",
+                            headers={"Retry-After": "5"})
+    pending_jobs += 1
+
+def release_job():
+    global pending_jobs
+    pending_jobs -= 1
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run a blocking call on the bounded executor, rejecting it when the queue is full."""
+    admit_job()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+    finally:
+        release_job()
+
+class JobSlot:
+    def __init__(self):
+        """An admitted pipeline slot that can be released from several places but only frees one slot."""
+        admit_job()
+        self.held = True
+
+    def release(self):
+        if self.held:
+            self.held = False
+            release_job()
+
+async def stream_events(events, slot: JobSlot):
+    """Drive a blocking event generator on the executor and format its events as server-sent events.
+    The slot is released and the generator closed when the stream ends or the client goes away."""
+    loop = asyncio.get_running_loop()
+    done = object()
+    pending = None
+    try:
+        while True:
+            pending = loop.run_in_executor(executor, next, events, done)
+            event = await pending
+            if event is done:
+                break
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+    except Exception as e:
+        yield f"event: error\ndata: {json.dumps(str(e))}\n\n"
+    finally:
+        slot.release()
+        # A disconnect cancels the await but not the next() running on the executor; close after it returns
+        if pending is not None and not pending.done():
+            pending.add_done_callback(lambda _: events.close())
+        else:
+            events.close()
+
+async def generate_coalesced(user_abstract: str, mode: str, use_cache: bool = True) -> str:
+    """Run generate_storytelling_output once for identical concurrent requests; the others attach to it
+    and receive the same result or error."""
+    key = (rag.request_key("storytelling", user_abstract, mode, 3), use_cache)
+    return await generations.do(key, lambda: run_blocking(
+        rag.generate_storytelling_output,
+        user_abstract=user_abstract,
+        mode=mode,
+        k=3,
+        use_cache=use_cache
+    ))
+
+def extract_upload_text(filename: str, content: bytes) -> str:
+    """Return the text of an uploaded PDF or text file."""
+    if filename.lower().endswith('.pdf'):
+        # Extract text from PDF
+        pdf_reader = PyPDF2.PdfReader(io.BytesIO(content))
+        text = ""
+        for page in pdf_reader.pages:
+            text += page.extract_text() or ""
+        return text
+    # Assume text file
+    return content.decode('utf-8')
+
 @app.get("/", response_class=HTMLResponse)
 async def read_index(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 @app.post("/run")
-async def run_storytelling(input: InputText, mode: str = "general"):
+async def run_storytelling(input: InputText, mode: str = "general", no_cache: bool = False):
+    """Generate one mode; identical resubmissions are served from the result cache unless no_cache is set."""
     text = input.input_data
 
     # Call RAG system
-    general_version = rag.generate_storytelling_output(
-        user_abstract=text,
-        mode=mode,
+    general_version = await generate_coalesced(text, mode, use_cache=not no_cache)
+
+    return {"result": general_version}
+
+@app.post("/run/all")
+async def run_storytelling_all_modes(input: InputText, modes: List[str] = Query(MODES)):
+    """Generate several modes from one shared retrieval and context."""
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown modes: {', '.join(unknown)}")
+
+    results = await run_blocking(
+        rag.generate_all_modes,
+        user_abstract=input.input_data,
+        modes=modes,
         k=3
     )
+    return {"results": results}
 
-    return {"result": general_version}
+@app.post("/run/stream")
+async def run_storytelling_stream(input: InputText, mode: str = "general", no_cache: bool = False):
+    """Stream retrieval/context stage events, then completion tokens, as server-sent events.
+    Results are shared with /run's cache: a cached one is sent as a single token event unless no_cache is set."""
+    slot = JobSlot()
+    try:
+        events = rag.stream_storytelling_output(user_abstract=input.input_data, mode=mode, k=3,
+                                                use_cache=not no_cache)
+        return StreamingResponse(
+            stream_events(events, slot),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            # Runs even if the client disconnects before the body is iterated, when the generator's
+            # finally never does
+            background=BackgroundTask(slot.release)
+        )
+    except Exception:
+        slot.release()
+        raise
 
 @app.post("/process")
-async def process_file(file: UploadFile = File(...), mode: str = Form("general")):
+async def process_file(file: UploadFile = File(...), mode: str = Form("general"), no_cache: bool = Form(False)):
     try:
         content = await file.read()
-        if file.filename.lower().endswith('.pdf'):
-            # Extract text from PDF
-            pdf_reader = PyPDF2.PdfReader(io.BytesIO(content))
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() or ""
-        else:
-            # Assume text file
-            text = content.decode('utf-8')
-        
-        result = rag.generate_storytelling_output(
-            user_abstract=text,
-            mode=mode,
-            k=3
-        )
+        text = await run_blocking(extract_upload_text, file.filename, content)
+
+        result = await generate_coalesced(text, mode, use_cache=not no_cache)
         return {"result": result}
+    except HTTPException:
+        raise
     except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
+
+@app.get("/stats")
+async def stats():
+    """Request coalescing and result cache counters."""
+    return {
+        "singleflight": generations.info(),
+        "result_cache": rag.result_cache.info(),
+        "pending_jobs": pending_jobs
+    }
@@ -143,7 +143,7 @@ def print_evaluation_results(evaluation: Dict):
         print(f"{metric.replace('_', ' ').title()}: {value:.3f}")
 
 def main():
-    from ragcot import get_embedding
+    from embeddings import get_embedding
     
     evaluator = PitchEvaluator()
     
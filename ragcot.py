@@ -1,11 +1,19 @@
 from openai import OpenAI
 import os
 from dotenv import load_dotenv
-from typing import List, Tuple, Dict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 import json
-from scoring_model_inference import score_pitch
+from concurrent.futures import ThreadPoolExecutor
+from document_store import document_store_exists, open_document_store
+from caching import text_hash
+from embeddings import get_embedding
+from result_cache import ResultCache, result_key
+from summaries import MAIN_POINTS_PROMPT, extract_main_points
+from scoring_model_inference import get_scoring_model
+from vector_search import (AGGREGATIONS, ANN_MIN_VECTORS, CHUNK_DOC_FILENAME, IVF_FILENAME, IVFIndex, aggregate_hits,
+                           normalize_rows, top_k_indices)
+from vector_store import QUANTIZATIONS, RESCORE_FACTOR, QuantizedVectors, compact_filename
 
 # Load API key from .env
 load_dotenv()
@@ -14,41 +22,131 @@ client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 # Constants for vector database paths
 VEC_PATH = "datas/db/vectors.npy"
 DOC_PATH = "datas/db/documents.json"
+# Number of IVF lists probed per query; higher trades latency for recall
+NPROBE = int(os.getenv("ANN_NPROBE", "8"))
+# Maximum number of concurrent main-point extraction calls per process
+MAIN_POINTS_CONCURRENCY = int(os.getenv("MAIN_POINTS_CONCURRENCY", "4"))
+# How chunk hits of a chunked vector DB are combined per document ("max" or "sum"),
+# and how many chunk hits are gathered per requested document
+CHUNK_AGGREGATION = os.getenv("CHUNK_AGGREGATION", "max")
+CHUNK_CANDIDATES = int(os.getenv("CHUNK_CANDIDATES", "4"))
+# Search matrix format: "float32", or "float16"/"int8" codes rescored against vectors.npy on disk
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "float32")
 
-def get_embedding(text: str) -> List[float]:
-    """Get embedding vector for input text."""
-    response = client.embeddings.create(
-        model="text-embedding-ada-002",
-        input=text
-    )
-    return response.data[0].embedding
+# Candidates sampled per self-reflection round (one completion call with n choices)
+REFLECTION_CANDIDATES = int(os.getenv("REFLECTION_CANDIDATES", "3"))
+
+MODES = ["general", "investor", "conference"]
+GENERATION_SYSTEM_PROMPT = "You are a storytelling assistant that enhances technical abstracts for specific audiences while maintaining technical accuracy."
+IMPROVEMENT_SYSTEM_PROMPT = "You are a skilled writer that can improve text based on feedback."
+IMPROVEMENT_PROMPT = """
+        Your previous attempt score:
+        {explanation}
+
+        Each score is on a scale from 1 to 5. The higher the score, the better the pitch.
+
+        Please improve the text while addressing these points. Keep the same mode ({mode}) and maintain the core message.
+        The improved version should be within 100 words.
+
+        Previous version:
+        {generated_text}
+        """
 
 # ========== RAG Storytelling System ==========
 class RAGSystem:
-    def __init__(self, vec_path: str = VEC_PATH, doc_path: str = DOC_PATH):
-        """Initialize RAG system with pre-computed embeddings."""
+    def __init__(self, vec_path: str = VEC_PATH, doc_path: str = DOC_PATH, nprobe: int = NPROBE,
+                 max_concurrency: int = MAIN_POINTS_CONCURRENCY, chunk_aggregation: str = CHUNK_AGGREGATION,
+                 quantization: str = VECTOR_QUANTIZATION, result_cache: Optional[ResultCache] = None):
+        """Initialize RAG system with pre-computed embeddings.
+        Finished outputs are cached in result_cache (default: configured from the RESULT_CACHE_* variables)."""
+        if chunk_aggregation not in AGGREGATIONS:
+            raise ValueError(f"chunk_aggregation must be one of {AGGREGATIONS}, got {chunk_aggregation!r}")
+        if quantization != "float32" and quantization not in QUANTIZATIONS:
+            raise ValueError(f"quantization must be float32 or one of {QUANTIZATIONS}, got {quantization!r}")
         self.documents = []          # Raw text documents
-        self.embeddings = []         # Corresponding embeddings
+        self.main_points = []        # Precomputed main point per document (None if not summarized)
+        self.embeddings = np.empty((0, 0), dtype=np.float32)  # Unit-norm embeddings, one row per document or chunk
+        self.chunk_doc = None        # Document index of every embedding row when the DB is chunked
+        self.index = None            # Optional IVF index over self.embeddings
+        self.nprobe = nprobe
+        self.chunk_aggregation = chunk_aggregation
+        self.quantization = quantization
+        self.result_cache = result_cache if result_cache is not None else ResultCache()
+        # Shared by all requests so concurrent extraction calls stay within the limit
+        self.extract_pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="main-points")
         
         # Load pre-computed embeddings if they exist
-        if os.path.exists(vec_path) and os.path.exists(doc_path):
+        if os.path.exists(vec_path) and (os.path.exists(doc_path) or document_store_exists(os.path.dirname(vec_path))):
             self.load_vector_database(vec_path, doc_path)
     
     def load_vector_database(self, vec_path: str, doc_path: str):
         """Load pre-computed embeddings and documents from vector database."""
-        # Load embeddings
-        self.embeddings = np.load(vec_path).tolist()
+        if self.quantization == "float32":
+            # Load embeddings as one pre-normalized float32 matrix
+            self.embeddings = normalize_rows(np.load(vec_path, mmap_mode="r"))
+        else:
+            # Search on compact codes; full-precision rows stay memory-mapped for rescoring
+            self.embeddings = self.load_quantized_vectors(vec_path)
         
-        # Load documents
-        with open(doc_path, 'r', encoding='utf-8') as f:
-            doc_data = json.load(f)
-            self.documents = [doc["content"] for doc in doc_data]
+        # Load documents lazily from the memory-mapped store; texts are decoded only when retrieved
+        store = open_document_store(os.path.dirname(vec_path), doc_path)
+        if store is not None:
+            self.documents, self.main_points = store
+        else:
+            print(f"Parsing {doc_path}; run `python document_store.py` to memory-map documents instead")
+            with open(doc_path, 'r', encoding='utf-8') as f:
+                doc_data = json.load(f)
+                self.documents = [doc["content"] for doc in doc_data]
+                self.main_points = [doc.get("main_point") for doc in doc_data]
+
+        # Chunked databases map every embedding row back to its document
+        chunk_doc_path = os.path.join(os.path.dirname(vec_path), CHUNK_DOC_FILENAME)
+        if os.path.exists(chunk_doc_path):
+            chunk_doc = np.load(chunk_doc_path)
+            if len(chunk_doc) == len(self.embeddings):
+                self.chunk_doc = chunk_doc
+            else:
+                print(f"Ignoring stale chunk mapping {chunk_doc_path}: {len(chunk_doc)} rows for {len(self.embeddings)} vectors")
+
+        # Load the ANN index built alongside the vectors, if any; small corpora are searched exactly
+        index_path = os.path.join(os.path.dirname(vec_path), IVF_FILENAME)
+        if os.path.exists(index_path):
+            index = IVFIndex.load(index_path)
+            if len(index) < ANN_MIN_VECTORS:
+                print(f"Ignoring ANN index {index_path}: {len(index)} vectors is below ANN_MIN_VECTORS={ANN_MIN_VECTORS}")
+            elif len(index) == len(self.embeddings):
+                self.index = index
+            else:
+                print(f"Ignoring stale ANN index {index_path}: {len(index)} ids for {len(self.embeddings)} vectors")
     
+    def load_quantized_vectors(self, vec_path: str) -> QuantizedVectors:
+        """Load the compact codes saved next to vec_path, quantizing on the fly if they are missing or stale."""
+        full = np.load(vec_path, mmap_mode="r")
+        compact_path = os.path.join(os.path.dirname(vec_path), compact_filename(self.quantization))
+        if os.path.exists(compact_path):
+            vectors = QuantizedVectors.load(compact_path, full=full)
+            if len(vectors) == len(full):
+                return vectors
+            print(f"Ignoring stale {compact_path}: {len(vectors)} rows for {len(full)} vectors")
+        print(f"Quantizing {len(full)} vectors to {self.quantization}; "
+              f"build the DB with quantize={self.quantization!r} to skip this at startup")
+        return QuantizedVectors.quantize(full, self.quantization)
+
     def add_document(self, text: str):
         """Add a new document to the knowledge base (with embedding computation)."""
-        embedding = get_embedding(text)
+        embedding = normalize_rows(np.asarray([get_embedding(text)]))
         self.documents.append(text)
-        self.embeddings.append(embedding)
+        self.main_points.append(None)  # Summarized on demand in format_context
+        if isinstance(self.embeddings, QuantizedVectors):
+            self.embeddings.append(embedding)
+        elif self.embeddings.size:
+            self.embeddings = np.vstack([self.embeddings, embedding])
+        else:
+            self.embeddings = embedding
+        if self.chunk_doc is not None:
+            self.chunk_doc = np.append(self.chunk_doc, len(self.documents) - 1)
+        if self.index is not None:
+            self.index.add(np.array([len(self.embeddings) - 1]), embedding)
     
     def load_documents_from_folder(self, folder_path: str):
         """Load all .txt files from a folder into the knowledge base.
@@ -59,32 +157,53 @@ class RAGSystem:
                 with open(os.path.join(folder_path, filename), 'r', encoding='utf-8') as file:
                     self.add_document(file.read())
     
-    def retrieve_relevant_docs(self, query: str, k: int = 5) -> List[str]:
+    def retrieve_relevant_docs(self, query: str, k: int = 5, nprobe: Optional[int] = None) -> List[str]:
         """Return top-k most similar documents to the query."""
-        query_embedding = get_embedding(query)
-        similarities = cosine_similarity([query_embedding], self.embeddings)[0]
-        top_k_indices = np.argsort(similarities)[-k:][::-1]
-        return [self.documents[i] for i in top_k_indices]
+        return [self.documents[i] for i in self.retrieve_relevant_indices(query, k, nprobe)]
+
+    def retrieve_relevant_indices(self, query: str, k: int = 5, nprobe: Optional[int] = None) -> List[int]:
+        """Return indices of the top-k most similar documents to the query.
+        On a chunked DB, the best chunk hits are aggregated into distinct documents."""
+        if not self.documents:
+            return []
+        query_embedding = normalize_rows(np.asarray(get_embedding(query)))
+        num_hits = k if self.chunk_doc is None else k * CHUNK_CANDIDATES
+        quantized = isinstance(self.embeddings, QuantizedVectors)
+        shortlist = num_hits * RESCORE_FACTOR if quantized else num_hits
+        if self.index is not None:
+            # Approximate search over the nprobe closest IVF lists
+            top_ids, top_scores = self.index.search(self.embeddings, query_embedding, shortlist, nprobe or self.nprobe)
+        else:
+            # Rows are unit-norm, so a single mat-vec gives cosine similarities
+            similarities = self.embeddings @ query_embedding
+            top_ids = top_k_indices(similarities, shortlist)
+            top_scores = similarities[top_ids]
+        if quantized:
+            # Re-rank the shortlist by exact similarity from the full-precision vectors
+            top_scores = self.embeddings.rescore(top_ids, query_embedding)
+            top = top_k_indices(top_scores, num_hits)
+            top_ids, top_scores = top_ids[top], top_scores[top]
+        if self.chunk_doc is not None:
+            top_ids, _ = aggregate_hits(top_ids, top_scores, self.chunk_doc, k, self.chunk_aggregation)
+        return [int(i) for i in top_ids]
 
     def extract_main_points(self, document: str) -> str:
         """Extract the main points from a document using GPT."""
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "Carefully read through the document and consider what its main topics are and why they are important. Then, extract the key contribution or main point from the given text in one concise sentence."},
-                {"role": "user", "content": document}
-            ],
-            max_tokens=100,
-            temperature=0.3
-        )
-        return response.choices[0].message.content.strip()
+        return extract_main_points(document)
+
+    def format_context(self, relevant_docs: List[str], summaries: Optional[List[Optional[str]]] = None) -> str:
+        """Format the context by extracting and summarizing main points.
+        summaries holds the precomputed main point of each document; missing ones are extracted live."""
+        points = list(summaries or [None] * len(relevant_docs))
+
+        # Extract the missing main points concurrently; map() keeps retrieval order
+        missing = [i for i, point in enumerate(points) if not point]
+        extracted = self.extract_pool.map(self.extract_main_points, [relevant_docs[i] for i in missing])
+        for i, point in zip(missing, extracted):
+            points[i] = point
 
-    def format_context(self, relevant_docs: List[str]) -> str:
-        """Format the context by extracting and summarizing main points."""
-        # Extract main points from each document
         main_points = []
-        for doc in relevant_docs:
-            point = self.extract_main_points(doc)
+        for point in points:
             if point and not any(p.lower() == point.lower() for p in main_points):  # Avoid duplicates
                 main_points.append(point)
         
@@ -172,105 +291,248 @@ class RAGSystem:
 
     def score_output(self, generated_text: str, user_abstract: str, mode: str) -> Tuple[float, str]:
         """Evaluate the quality of the generated output using the scoring model."""
-        # Get scores from the scoring model
-        scores = score_pitch(user_abstract, generated_text)
-        
-        # sum up the scores 
-        avg_score = sum(scores.values())
-        
-        # Generate explanation based on scores
-        explanation = f"Scores: {', '.join(f'{k}: {v:.2f}' for k, v in scores.items())}"
-        
-        return avg_score, explanation
+        return self.score_outputs([generated_text], user_abstract, mode)[0]
 
-    def improve_output(self, generated_text: str, score: float, explanation: str, mode: str) -> str:
-        """Attempt to improve the output based on the critique."""
-        improvement_prompt = f"""
-        Your previous attempt score:
-        {explanation}
+    def explain_scores(self, scores: Dict[str, float]) -> str:
+        """Critique passed to the improvement prompt."""
+        return f"Scores: {', '.join(f'{k}: {v:.2f}' for k, v in scores.items())}"
 
-        Each score is on a scale from 1 to 5. The higher the score, the better the pitch.
+    def score_outputs(self, outputs: List[str], user_abstract: str, mode: str) -> List[Tuple[float, str]]:
+        """Score several outputs for the same abstract in one batch; (total score, explanation) per output."""
+        # Get scores from the shared scoring model
+        all_scores = get_scoring_model().score_pitches([user_abstract] * len(outputs), outputs)
 
-        Please improve the text while addressing these points. Keep the same mode ({mode}) and maintain the core message.
-        The improved version should be within 100 words.
+        # Sum up the scores and generate explanations based on them
+        return [(sum(scores.values()), self.explain_scores(scores)) for scores in all_scores]
 
-        Previous version:
-        {generated_text}
-        """
+    def improve_output(self, generated_text: str, score: float, explanation: str, mode: str) -> str:
+        """Attempt to improve the output based on the critique."""
+        return self.improve_candidates(generated_text, score, explanation, mode, n=1)[0]
+
+    def improve_candidates(self, generated_text: str, score: float, explanation: str, mode: str,
+                           n: int = REFLECTION_CANDIDATES) -> List[str]:
+        """Sample n improved versions of the output from one completion call."""
+        improvement_prompt = IMPROVEMENT_PROMPT.format(explanation=explanation, mode=mode, generated_text=generated_text)
 
         response = client.chat.completions.create(
             model="gpt-4",
             messages=[
-                {"role": "system", "content": "You are a skilled writer that can improve text based on feedback."},
+                {"role": "system", "content": IMPROVEMENT_SYSTEM_PROMPT},
                 {"role": "user", "content": improvement_prompt}
             ],
             max_tokens=600,
-            temperature=0.7
+            temperature=0.7,
+            n=n
         )
 
-        return response.choices[0].message.content.strip()
+        return [choice.message.content.strip() for choice in response.choices]
+
+    def prompt_version(self, mode: str) -> str:
+        """Hash of every prompt that shapes a mode's cached outputs (generation, main points, context,
+        critique and improvement); editing any of them invalidates the cached results."""
+        prompts = [
+            GENERATION_SYSTEM_PROMPT,
+            self.create_prompt("{context}", "{user_abstract}", mode),
+            MAIN_POINTS_PROMPT,
+            self.format_context(["{document}"], ["{main_point}"]),
+            self.format_context([], []),
+            self.explain_scores({"{criterion}": 0.0}),
+            IMPROVEMENT_SYSTEM_PROMPT,
+            IMPROVEMENT_PROMPT,
+        ]
+        return text_hash("\n".join(prompts), normalize=False)[:16]
+
+    def request_key(self, kind: str, user_abstract: str, mode: str, k: int, **params) -> str:
+        """Key identifying a pipeline result: requests with equal keys produce interchangeable outputs."""
+        # The corpus size is part of the key: documents added at runtime change retrieval
+        return result_key(kind, user_abstract, mode, k, self.prompt_version(mode),
+                          documents=len(self.documents), **params)
+
+    def cached_result(self, kind: str, compute: Callable[[], Any], user_abstract: str, mode: str, k: int,
+                      use_cache: bool = True, **params) -> Any:
+        """Return the cached result for these arguments, or compute and cache it.
+        use_cache=False skips the lookup but still stores the fresh result."""
+        key = self.request_key(kind, user_abstract, mode, k, **params)
+        if use_cache:
+            result = self.result_cache.get(key)
+            if result is not None:
+                return result
+        result = compute()
+        self.result_cache.put(key, result)
+        return result
 
     def generate_with_self_reflection(self, user_abstract: str, mode: str = "general", k: int = 5, 
-                                    threshold: float = 15, max_attempts: int = 3) -> Tuple[str, float, str]:
-        """Generate an output that passes self-reflection quality threshold."""
+                                    threshold: float = 15, max_attempts: int = 3,
+                                    candidates: int = REFLECTION_CANDIDATES, use_cache: bool = True,
+                                    formatted_context: Optional[str] = None) -> Tuple[str, float, str]:
+        """Generate an output that passes self-reflection quality threshold, or return the cached one.
+        Pass formatted_context (from build_context) to share one retrieval across several modes."""
+        result = self.cached_result(
+            "self_reflection",
+            lambda: self.run_self_reflection(user_abstract, mode, k, threshold, max_attempts, candidates,
+                                             formatted_context),
+            user_abstract, mode, k, use_cache,
+            threshold=threshold, max_attempts=max_attempts, candidates=candidates
+        )
+        return tuple(result)
+
+    def run_self_reflection(self, user_abstract: str, mode: str = "general", k: int = 5,
+                            threshold: float = 15, max_attempts: int = 3,
+                            candidates: int = REFLECTION_CANDIDATES,
+                            formatted_context: Optional[str] = None) -> Tuple[str, float, str]:
+        """Self-reflection loop behind generate_with_self_reflection. The context is built once (unless
+        given); each round samples `candidates` outputs, scores them in one batch and the best version so
+        far is what the next round improves on."""
         best_score = 0.0
         best_output = ""
         best_explanation = ""
         
         print(f"\n=== Starting self-reflection for {mode} mode ===")
-        print(f"Maximum attempts: {max_attempts}\n")
+        print(f"Maximum attempts: {max_attempts}, {candidates} candidates each\n")
+
+        # Retrieval and main points do not change between attempts
+        if formatted_context is None:
+            formatted_context = self.build_context(user_abstract, k)
+
+        print("Generating initial versions...")
+        outputs = self.generate_candidates(formatted_context, user_abstract, mode, candidates)
         
         for attempt in range(max_attempts):
             print(f"\nAttempt {attempt + 1}/{max_attempts}")
             
-            # Generate initial output
-            print("Generating initial version...")
-            output = self.generate_storytelling_output(user_abstract, mode, k)
-            
-            # Score the output
-            print("Evaluating quality...")
-            score, explanation = self.score_output(output, user_abstract, mode)
-            print(f"Score: {score:.1f}/10")
+            # Score every candidate of this round together
+            print(f"Evaluating {len(outputs)} candidates...")
+            results = self.score_outputs(outputs, user_abstract, mode)
+            round_best = max(range(len(outputs)), key=lambda i: results[i][0])
+            score, explanation = results[round_best]
+            print(f"Scores: {', '.join(f'{s:.1f}' for s, _ in results)} (best {score:.1f}/20)")
             
             # Keep track of best result
             if score > best_score:
                 best_score = score
-                best_output = output
+                best_output = outputs[round_best]
+                best_explanation = explanation
                 print("✓ New best version!")
             
             # If we meet the threshold, return immediately
             if score >= threshold:
-                print(f"\n✓ Successfully met quality threshold ({threshold}/10) on attempt {attempt + 1}")
-                return output, score, explanation
+                print(f"\n✓ Successfully met quality threshold ({threshold}/20) on attempt {attempt + 1}")
+                return outputs[round_best], score, explanation
             
-            # Otherwise, try to improve
+            # Otherwise, improve the best version so far; the improvements are scored next round
             if attempt < max_attempts - 1:  # Don't improve on last attempt
                 print("\nAttempting to improve based on feedback...")
-                output = self.improve_output(output, score, explanation, mode)
+                outputs = self.improve_candidates(best_output, best_score, best_explanation, mode, candidates)
         
         print(f"\n=== Self-reflection complete ===")
-        print(f"Best score achieved: {best_score:.1f}/10")
+        print(f"Best score achieved: {best_score:.1f}/20")
         print(f"Final feedback: {best_explanation}")
         
         return best_output, best_score, best_explanation
 
-    def generate_storytelling_output(self, user_abstract: str, mode: str = "general", k: int = 5) -> str:
-        """Main function to create a storytelling-style revision of the input abstract."""
-        # Get relevant documents and format context
-        relevant_docs = self.retrieve_relevant_docs(user_abstract, k)
-        formatted_context = self.format_context(relevant_docs)
-        
-        # Generate the enhanced version
+    def build_context(self, user_abstract: str, k: int = 5, indices: Optional[List[int]] = None) -> str:
+        """Retrieve related documents (unless their indices are given) and format their main points as context."""
+        if indices is None:
+            indices = self.retrieve_relevant_indices(user_abstract, k)
+        relevant_docs = [self.documents[i] for i in indices]
+        return self.format_context(relevant_docs, [self.main_points[i] for i in indices])
+
+    def generation_messages(self, prompt: str) -> List[Dict[str, str]]:
+        """Chat messages for the storytelling completion."""
+        return [
+            {"role": "system", "content": GENERATION_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+
+    def generate_from_context(self, formatted_context: str, user_abstract: str, mode: str = "general") -> str:
+        """Generate the mode-specific revision from an already built context."""
         prompt = self.create_prompt(formatted_context, user_abstract, mode)
         
         response = client.chat.completions.create(
             model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a storytelling assistant that enhances technical abstracts for specific audiences while maintaining technical accuracy."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=self.generation_messages(prompt),
             max_tokens=600,
             temperature=0.7
         )
 
         return response.choices[0].message.content
+
+    def generate_candidates(self, formatted_context: str, user_abstract: str, mode: str = "general",
+                            n: int = REFLECTION_CANDIDATES) -> List[str]:
+        """Sample n revisions from an already built context in one completion call."""
+        prompt = self.create_prompt(formatted_context, user_abstract, mode)
+
+        response = client.chat.completions.create(
+            model="gpt-4",
+            messages=self.generation_messages(prompt),
+            max_tokens=600,
+            temperature=0.7,
+            n=n
+        )
+
+        return [choice.message.content for choice in response.choices]
+
+    def generate_storytelling_output(self, user_abstract: str, mode: str = "general", k: int = 5,
+                                     use_cache: bool = True) -> str:
+        """Main function to create a storytelling-style revision of the input abstract.
+        Repeated requests are answered from the result cache unless use_cache=False."""
+        return self.cached_result(
+            "storytelling", lambda: self.generate_uncached(user_abstract, mode, k),
+            user_abstract, mode, k, use_cache
+        )
+
+    def generate_uncached(self, user_abstract: str, mode: str = "general", k: int = 5) -> str:
+        """Retrieve, build the context and generate, bypassing the result cache."""
+        # Get relevant documents and format context from their precomputed main points
+        formatted_context = self.build_context(user_abstract, k)
+        
+        # Generate the enhanced version
+        return self.generate_from_context(formatted_context, user_abstract, mode)
+
+    def generate_all_modes(self, user_abstract: str, modes: List[str] = MODES, k: int = 5) -> Dict[str, str]:
+        """Generate several modes at once: retrieval and context are shared, completions run concurrently."""
+        formatted_context = self.build_context(user_abstract, k)
+        with ThreadPoolExecutor(max_workers=max(1, len(modes))) as pool:
+            outputs = pool.map(lambda mode: self.generate_from_context(formatted_context, user_abstract, mode), modes)
+            return dict(zip(modes, outputs))
+
+    def stream_storytelling_output(self, user_abstract: str, mode: str = "general", k: int = 5,
+                                   use_cache: bool = True) -> Iterator[Dict[str, Any]]:
+        """Streaming variant of generate_storytelling_output, sharing its result cache.
+        Yields stage events ("retrieval", "context"), then "token" events as the completion arrives, then "done".
+        A cached result is sent as a single "token" event; use_cache=False regenerates it."""
+        key = self.request_key("storytelling", user_abstract, mode, k)
+        if use_cache:
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                yield {"event": "token", "data": cached}
+                yield {"event": "done", "data": {"cached": True}}
+                return
+
+        indices = self.retrieve_relevant_indices(user_abstract, k)
+        yield {"event": "retrieval", "data": {"documents": len(indices)}}
+
+        formatted_context = self.build_context(user_abstract, k, indices=indices)
+        yield {"event": "context", "data": {"context": formatted_context}}
+
+        prompt = self.create_prompt(formatted_context, user_abstract, mode)
+        stream = client.chat.completions.create(
+            model="gpt-4",
+            messages=self.generation_messages(prompt),
+            max_tokens=600,
+            temperature=0.7,
+            stream=True
+        )
+        parts = []
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield {"event": "token", "data": parts[-1]}
+        finally:
+            # Closing this generator early (client disconnect) closes the upstream HTTP stream too
+            stream.close()
+
+        # Only a completed stream is cached; an abandoned one would cache a truncated result
+        self.result_cache.put(key, "".join(parts))
+        yield {"event": "done", "data": {"cached": False}}
@@ -0,0 +1,111 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from caching import LRUCache, text_hash
+
+# Finished pipeline results kept in memory, and seconds before one is regenerated (0 = never expires)
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "86400"))
+# sqlite file that keeps results across restarts; unset keeps them in memory only
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "")
+# Rows kept in the sqlite file; the least recently used ones are deleted beyond that
+RESULT_CACHE_DISK_SIZE = int(os.getenv("RESULT_CACHE_DISK_SIZE", "10000"))
+
+
+def result_key(kind: str, user_abstract: str, mode: str, k: int, prompt_version: str, **params: Any) -> str:
+    """Cache key of a pipeline result: the whitespace-normalized abstract plus everything else that shapes the output."""
+    fields = {"kind": kind, "abstract": text_hash(user_abstract), "mode": mode, "k": k,
+              "prompt_version": prompt_version, **params}
+    return text_hash(json.dumps(fields, sort_keys=True), normalize=False)
+
+
+class ResultCache:
+    def __init__(self, maxsize: int = RESULT_CACHE_SIZE, ttl: float = RESULT_CACHE_TTL,
+                 path: Optional[str] = RESULT_CACHE_PATH or None, disk_maxsize: int = RESULT_CACHE_DISK_SIZE):
+        """LRU cache of JSON-serializable results with a time to live, optionally backed by a sqlite file.
+        Memory misses fall through to the file, so results survive restarts. maxsize=0 disables caching."""
+        self.ttl = ttl
+        self.path = path
+        self.disk_maxsize = disk_maxsize
+        self.hits = 0
+        self.misses = 0
+        self.memory = LRUCache(maxsize)  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._db = None
+        if path and maxsize > 0:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            # Requests run on a thread pool; every access below holds self._lock
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS results "
+                             "(key TEXT PRIMARY KEY, value TEXT, expires_at REAL, used_at REAL)")
+            self._db.commit()
+
+    def _expires_at(self) -> float:
+        return time.time() + self.ttl if self.ttl > 0 else float("inf")
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached result, or None if it is missing or expired."""
+        entry = self.memory.get(key)
+        if entry is None and self._db is not None:
+            with self._lock:
+                row = self._db.execute("SELECT value, expires_at FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._db.execute("UPDATE results SET used_at = ? WHERE key = ?", (time.time(), key))
+                    self._db.commit()
+            if row is not None:
+                entry = (row[1], json.loads(row[0]))
+                self.memory.put(key, entry)
+
+        with self._lock:
+            if entry is None or entry[0] <= time.time():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, value: Any):
+        """Store a result in memory and, if configured, in the sqlite file."""
+        if self.memory.maxsize <= 0:
+            return
+        expires_at = self._expires_at()
+        self.memory.put(key, (expires_at, value))
+        if self._db is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                             (key, json.dumps(value), expires_at, now))
+            # Drop expired rows, then the least recently used ones beyond disk_maxsize
+            self._db.execute("DELETE FROM results WHERE expires_at <= ?", (now,))
+            self._db.execute("DELETE FROM results WHERE key NOT IN "
+                             "(SELECT key FROM results ORDER BY used_at DESC LIMIT ?)", (self.disk_maxsize,))
+            self._db.commit()
+
+    def clear(self):
+        """Drop every cached result, on disk too, and reset the counters."""
+        self.memory.clear()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM results")
+                self._db.commit()
+
+    def info(self) -> Dict[str, float]:
+        """Return hit/miss counters and occupancy."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            info = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self.memory),
+                "maxsize": self.memory.maxsize,
+            }
+            if self._db is not None:
+                info["disk_size"] = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            return info
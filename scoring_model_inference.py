@@ -1,113 +1,276 @@
-def score_pitch(abstract, generated_pitch):
-    import torch
-    from transformers import AutoTokenizer, AutoModel
-    import torch.nn as nn
-    import numpy as np
-
-    # Load tokenizer and encoders
-    model_name = 'bert-base-uncased'
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    transformer_abstract = AutoModel.from_pretrained(model_name)  # X_text
-    transformer_pitch = AutoModel.from_pretrained(model_name)     # X_decoded
-
-    # Define model
-    class CombinedModel(nn.Module):
-        def __init__(self, transformer_abstract, transformer_pitch, mlp_input_dim, mlp_output_dim, use_mean_pooling=False):
-            super().__init__()
-            self.transformer_abstract = transformer_abstract
-            self.transformer_pitch = transformer_pitch
-            self.use_mean_pooling = use_mean_pooling
-
-            for param in self.transformer_abstract.parameters():
-                param.requires_grad = False
-            for param in self.transformer_pitch.parameters():
-                param.requires_grad = False
-
-            self.mlp = nn.Sequential(
-                nn.Linear(mlp_input_dim, 128),
-                nn.ReLU(),
-                nn.Linear(128, mlp_output_dim)
-            )
-
-        def mean_pool(self, hidden_state, attention_mask):
-            mask_expanded = attention_mask.unsqueeze(-1).expand(hidden_state.size()).float()
-            return (hidden_state * mask_expanded).sum(1) / mask_expanded.sum(1).clamp(min=1e-9)
-
-        def forward(self, input_ids_1, attention_mask_1, input_ids_2, attention_mask_2):
-            outputs_1 = self.transformer_abstract(input_ids=input_ids_1, attention_mask=attention_mask_1)
-            outputs_2 = self.transformer_pitch(input_ids=input_ids_2, attention_mask=attention_mask_2)
-
-            if self.use_mean_pooling:
-                emb_1 = self.mean_pool(outputs_1.last_hidden_state, attention_mask_1)
-                emb_2 = self.mean_pool(outputs_2.last_hidden_state, attention_mask_2)
-            else:
-                emb_1 = outputs_1.last_hidden_state[:, 0, :]
-                emb_2 = outputs_2.last_hidden_state[:, 0, :]
-
-            combined = torch.cat((emb_1, emb_2), dim=1)
-            return self.mlp(combined)
-
-    # Tokenization helper
-    def tokenize_pair(decoded_text, original_text, tokenizer, max_length=128):
-        encoded_decoded = tokenizer(
-            decoded_text,
-            add_special_tokens=True,
-            max_length=max_length,
-            padding="max_length",
-            truncation=True,
-            return_tensors="pt"
+import os
+import threading
+from typing import Dict, List, Optional
+
+import torch
+import torch.nn as nn
+from transformers import AutoTokenizer, AutoModel
+
+from caching import LRUCache, text_hash
+
+MODEL_NAME = 'bert-base-uncased'
+CHECKPOINT_PATH = "scoring_model.pt"
+CATEGORIES = ["coherence", "consistency", "fluency", "relevance"]
+MAX_LENGTH = 128
+BATCH_SIZE = 32
+ABSTRACT_CACHE_SIZE = int(os.getenv("ABSTRACT_CACHE_SIZE", "1024"))
+# fp32 (default), int8 (dynamic quantization of Linear layers) or torchscript (traced encoders)
+SCORING_BACKEND = os.getenv("SCORING_BACKEND", "fp32")
+BACKENDS = ("fp32", "int8", "torchscript")
+
+
+class CombinedModel(nn.Module):
+    def __init__(self, transformer_abstract, transformer_pitch, mlp_input_dim, mlp_output_dim, use_mean_pooling=False):
+        super().__init__()
+        self.transformer_abstract = transformer_abstract
+        self.transformer_pitch = transformer_pitch
+        self.use_mean_pooling = use_mean_pooling
+
+        for param in self.transformer_abstract.parameters():
+            param.requires_grad = False
+        for param in self.transformer_pitch.parameters():
+            param.requires_grad = False
+
+        self.mlp = nn.Sequential(
+            nn.Linear(mlp_input_dim, 128),
+            nn.ReLU(),
+            nn.Linear(128, mlp_output_dim)
         )
-        encoded_text = tokenizer(
-            original_text,
-            add_special_tokens=True,
-            max_length=max_length,
-            padding="max_length",
-            truncation=True,
-            return_tensors="pt"
+
+    def mean_pool(self, hidden_state, attention_mask):
+        mask_expanded = attention_mask.unsqueeze(-1).expand(hidden_state.size()).float()
+        return (hidden_state * mask_expanded).sum(1) / mask_expanded.sum(1).clamp(min=1e-9)
+
+    def pool(self, outputs, attention_mask):
+        """Reduce encoder outputs to one vector per sequence."""
+        # outputs[0] is last_hidden_state for both ModelOutput and traced tuple outputs
+        if self.use_mean_pooling:
+            return self.mean_pool(outputs[0], attention_mask)
+        return outputs[0][:, 0, :]
+
+    # The checkpoint was trained on (input_1=pitch, input_2=abstract): despite the attribute names, the
+    # pitch goes through transformer_abstract and the abstract through transformer_pitch.
+    # token_type_ids are passed explicitly (all zeros, the default) so traced towers never slice them by shape.
+    def encode_pitch(self, input_ids, attention_mask):
+        outputs = self.transformer_abstract(input_ids, attention_mask, torch.zeros_like(input_ids))
+        return self.pool(outputs, attention_mask)
+
+    def encode_abstract(self, input_ids, attention_mask):
+        outputs = self.transformer_pitch(input_ids, attention_mask, torch.zeros_like(input_ids))
+        return self.pool(outputs, attention_mask)
+
+    def head(self, emb_pitch, emb_abstract):
+        combined = torch.cat((emb_pitch, emb_abstract), dim=1)
+        return self.mlp(combined)
+
+    def forward(self, input_ids_1, attention_mask_1, input_ids_2, attention_mask_2):
+        emb_1 = self.encode_pitch(input_ids_1, attention_mask_1)
+        emb_2 = self.encode_abstract(input_ids_2, attention_mask_2)
+        return self.head(emb_1, emb_2)
+
+
+def tokenize_texts(texts: List[str], tokenizer, max_length: int = MAX_LENGTH) -> Dict[str, List[List[int]]]:
+    """Tokenize texts in bulk without padding; batches are padded later."""
+    return tokenizer(
+        list(texts),
+        add_special_tokens=True,
+        max_length=max_length,
+        truncation=True
+    )
+
+
+class ScoringModel:
+    def __init__(self, checkpoint_path: str = CHECKPOINT_PATH, model_name: str = MODEL_NAME,
+                 device: Optional[str] = None, abstract_cache_size: int = ABSTRACT_CACHE_SIZE,
+                 backend: str = SCORING_BACKEND):
+        """Load tokenizer, both encoders and the trained checkpoint once."""
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown scoring backend {backend!r}; expected one of {BACKENDS}")
+        self.backend = backend
+        # Traced graphs are only valid for the sequence length they were traced with
+        self.padding = "max_length" if backend == "torchscript" else "longest"
+        if backend != "fp32":
+            # Both optimized backends target CPU inference
+            device = "cpu"
+        self.device = torch.device(device or ("cuda" if torch.cuda.is_available() else "cpu"))
+
+        # Both towers are frozen, so an abstract's embedding only depends on its text
+        self.abstract_cache = LRUCache(abstract_cache_size)
+
+        # Load tokenizer and encoders
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+        transformer_abstract = AutoModel.from_pretrained(model_name)  # X_text
+        transformer_pitch = AutoModel.from_pretrained(model_name)     # X_decoded
+
+        # Rebuild model
+        self.model = CombinedModel(
+            transformer_abstract=transformer_abstract,
+            transformer_pitch=transformer_pitch,
+            mlp_input_dim=transformer_abstract.config.hidden_size * 2,
+            mlp_output_dim=len(CATEGORIES),
+            use_mean_pooling=False
         )
-        return (
-            encoded_decoded['input_ids'],
-            encoded_decoded['attention_mask'],
-            encoded_text['input_ids'],
-            encoded_text['attention_mask']
+
+        # Load checkpoint
+        self.model.load_state_dict(torch.load(checkpoint_path, map_location=torch.device("cpu")))
+        self.model.to(self.device)
+        self.model.eval()
+
+        if backend == "int8":
+            self.model = torch.quantization.quantize_dynamic(self.model, {nn.Linear}, dtype=torch.qint8)
+        elif backend == "torchscript":
+            self.model.transformer_abstract = self._trace(self.model.transformer_abstract)
+            self.model.transformer_pitch = self._trace(self.model.transformer_pitch)
+
+    def _encoder_inputs(self, texts: List[str]):
+        """Tokenize texts the way the torchscript backend feeds its towers: padded to MAX_LENGTH."""
+        encoded = self.tokenizer(texts, max_length=MAX_LENGTH, padding="max_length", truncation=True,
+                                 return_tensors="pt")
+        ids = encoded["input_ids"].to(self.device)
+        return ids, encoded["attention_mask"].to(self.device), torch.zeros_like(ids)
+
+    def _trace(self, transformer):
+        """Export an encoder to a frozen TorchScript graph with tuple outputs, traced on MAX_LENGTH inputs.
+        Raises RuntimeError if the graph disagrees with the eager encoder at another batch size."""
+        transformer.config.torchscript = True
+        example = self._encoder_inputs(["example input", "a second, somewhat longer example input"])
+        with torch.no_grad():
+            traced = torch.jit.freeze(torch.jit.trace(transformer, example))
+            for batch in (["one"], ["first check input", "second", "the third and longest check input"]):
+                inputs = self._encoder_inputs(batch)
+                if not torch.allclose(traced(*inputs)[0], transformer(*inputs)[0], atol=1e-4):
+                    raise RuntimeError(f"Traced encoder does not match the eager one for batch size {len(batch)}")
+        return traced
+
+    def score(self, abstract: str, generated_pitch: str) -> Dict[str, float]:
+        """Score a single pitch against its abstract on the four criteria."""
+        return self.score_pitches([abstract], [generated_pitch], batch_size=1)[0]
+
+    def score_reference(self, abstract: str, generated_pitch: str) -> Dict[str, float]:
+        """Score one pair exactly as the checkpoint was trained: model(pitch, abstract), both padded to
+        MAX_LENGTH, without the abstract cache. Used to check the optimized paths."""
+        encoded = [self.tokenizer(text, add_special_tokens=True, max_length=MAX_LENGTH, padding="max_length",
+                                  truncation=True, return_tensors="pt")
+                   for text in (generated_pitch, abstract)]
+        with torch.no_grad():
+            row = self.model(encoded[0]["input_ids"].to(self.device), encoded[0]["attention_mask"].to(self.device),
+                             encoded[1]["input_ids"].to(self.device), encoded[1]["attention_mask"].to(self.device))
+        return {k: float(v) for k, v in zip(CATEGORIES, row.cpu().numpy()[0])}
+
+    def _pad(self, encoded: Dict[str, List[List[int]]], indices: List[int]):
+        """Pad the selected sequences to the longest one (MAX_LENGTH for torchscript) and move them to the device."""
+        batch = self.tokenizer.pad(
+            {
+                "input_ids": [encoded["input_ids"][i] for i in indices],
+                "attention_mask": [encoded["attention_mask"][i] for i in indices],
+            },
+            padding=self.padding,
+            max_length=MAX_LENGTH,
+            return_tensors="pt"
         )
+        return batch["input_ids"].to(self.device), batch["attention_mask"].to(self.device)
 
-    # Rebuild model
-    mlp_input_dim = transformer_abstract.config.hidden_size * 2
-    mlp_output_dim = 4
-    model = CombinedModel(
-        transformer_abstract=transformer_abstract,
-        transformer_pitch=transformer_pitch,
-        mlp_input_dim=mlp_input_dim,
-        mlp_output_dim=mlp_output_dim,
-        use_mean_pooling=False
-    )
+    def score_pitches(self, abstracts: List[str], pitches: List[str],
+                      batch_size: int = BATCH_SIZE) -> List[Dict[str, float]]:
+        """Score many (abstract, pitch) pairs, batching pairs of similar length."""
+        if len(abstracts) != len(pitches):
+            raise ValueError(f"Got {len(abstracts)} abstracts but {len(pitches)} pitches")
+        if not pitches:
+            return []
+
+        abstract_keys = [text_hash(abstract) for abstract in abstracts]
+        abstract_embeddings = self._encode_abstracts(abstracts, abstract_keys, batch_size)
+
+        # Tokenize pitches up front; padding happens per batch
+        encoded_pitch = tokenize_texts(pitches, self.tokenizer)
+
+        # Sort by length so each batch pads to roughly the same size
+        order = sorted(range(len(pitches)), key=lambda i: len(encoded_pitch["input_ids"][i]))
+
+        results: List[Optional[Dict[str, float]]] = [None] * len(pitches)
+        for start in range(0, len(order), batch_size):
+            indices = order[start:start + batch_size]
+            ids, mask = self._pad(encoded_pitch, indices)
+
+            # Inference: pitch tower + MLP; abstract embeddings are precomputed
+            with torch.no_grad():
+                emb_pitch = self.model.encode_pitch(ids, mask)
+                emb_abstract = torch.stack([abstract_embeddings[abstract_keys[i]] for i in indices])
+                scores = self.model.head(emb_pitch, emb_abstract).cpu().numpy()
 
-    # Load checkpoint
-    model.load_state_dict(torch.load("scoring_model.pt", map_location=torch.device("cpu")))
-    model.eval()
+            for i, row in zip(indices, scores):
+                results[i] = {k: float(v) for k, v in zip(CATEGORIES, row)}
 
-    # Tokenize and prepare
-    ids1, mask1, ids2, mask2 = tokenize_pair(generated_pitch, abstract, tokenizer)
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    model.to(device)
-    ids1, mask1, ids2, mask2 = ids1.to(device), mask1.to(device), ids2.to(device), mask2.to(device)
+        return results
+
+    def _encode_abstracts(self, abstracts: List[str], keys: List[str],
+                          batch_size: int) -> Dict[str, torch.Tensor]:
+        """Return abstract embeddings keyed by text hash, running the tower only on cache misses."""
+        embeddings: Dict[str, torch.Tensor] = {}
+        missing: Dict[str, str] = {}
+        for abstract, key in zip(abstracts, keys):
+            if key in embeddings or key in missing:
+                continue
+            cached = self.abstract_cache.get(key)
+            if cached is not None:
+                embeddings[key] = cached
+            else:
+                missing[key] = abstract
+
+        if missing:
+            missing_keys = list(missing)
+            encoded = tokenize_texts([missing[key] for key in missing_keys], self.tokenizer)
+            order = sorted(range(len(missing_keys)), key=lambda i: len(encoded["input_ids"][i]))
+            for start in range(0, len(order), batch_size):
+                indices = order[start:start + batch_size]
+                ids, mask = self._pad(encoded, indices)
+                with torch.no_grad():
+                    batch_embeddings = self.model.encode_abstract(ids, mask)
+                for i, embedding in zip(indices, batch_embeddings):
+                    # Clone so a cached row does not keep the whole batch tensor alive
+                    embedding = embedding.clone()
+                    embeddings[missing_keys[i]] = embedding
+                    self.abstract_cache.put(missing_keys[i], embedding)
+
+        return embeddings
+
+    def cache_info(self) -> Dict[str, float]:
+        """Return hit/miss counters of the abstract embedding cache."""
+        return self.abstract_cache.info()
+
+
+_shared_model: Optional[ScoringModel] = None
+_shared_lock = threading.Lock()
+
+
+def get_scoring_model() -> ScoringModel:
+    """Return the process-wide scoring model, loading it on first use."""
+    global _shared_model
+    if _shared_model is None:
+        with _shared_lock:
+            if _shared_model is None:
+                _shared_model = ScoringModel(os.getenv("SCORING_MODEL_PATH", CHECKPOINT_PATH))
+    return _shared_model
+
+
+def score_pitch(abstract, generated_pitch):
+    """Score a pitch with the shared scoring model."""
+    return get_scoring_model().score(abstract, generated_pitch)
 
-    # Inference
-    with torch.no_grad():
-        scores = model(ids1, mask1, ids2, mask2).cpu().numpy()[0]
 
-    categories = ["coherence", "consistency", "fluency", "relevance"]
-    return {k: float(v) for k, v in zip(categories, scores)}
+def score_pitches(abstracts, pitches, batch_size=BATCH_SIZE):
+    """Score many (abstract, pitch) pairs with the shared scoring model."""
+    return get_scoring_model().score_pitches(abstracts, pitches, batch_size=batch_size)
 
 
-abstract_path = "evaluation/benchmark_set/bandit.txt"
-generated_pitch_path = "evaluation/generated_pitch/conference/bandit_conference.txt"
+if __name__ == "__main__":
+    abstract_path = "evaluation/benchmark_set/bandit.txt"
+    generated_pitch_path = "evaluation/generated_pitch/conference/bandit_conference.txt"
 
-with open(abstract_path, "r") as f:
-    abstract = f.read().strip()
-with open(generated_pitch_path, "r") as f:
-    pitch = f.read().strip()
+    with open(abstract_path, "r") as f:
+        abstract = f.read().strip()
+    with open(generated_pitch_path, "r") as f:
+        pitch = f.read().strip()
 
-scores = score_pitch(abstract, pitch)
-print(scores)
+    scores = score_pitch(abstract, pitch)
+    print(scores)
@@ -0,0 +1,46 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    def __init__(self):
+        """Coalesces concurrent async calls with the same key into one execution whose result (or error)
+        every caller receives. Not thread-safe: use it from the event loop thread only."""
+        self.calls = 0        # do() calls
+        self.executions = 0   # Calls that started a computation
+        self.coalesced = 0    # Calls that attached to one already in flight
+        self.errors = 0       # Computations that raised
+        self._inflight: Dict[Hashable, "asyncio.Future"] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await fn(), or the computation already running for key."""
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+        # A caller that goes away must not cancel the computation the others are waiting for
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: "asyncio.Future"):
+        # Later calls with this key start a new computation (which the result cache usually answers)
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+
+    def info(self) -> Dict[str, int]:
+        """Return call, execution, coalescing and error counters."""
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "in_flight": len(self._inflight),
+        }
@@ -0,0 +1,33 @@
+import os
+from openai import OpenAI
+from dotenv import load_dotenv
+
+from embeddings import get_encoding
+
+load_dotenv()
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+# Document tokens sent for summarizing: gpt-4's 8k context must also hold the prompt and the reply
+MAIN_POINTS_MAX_TOKENS = int(os.getenv("MAIN_POINTS_MAX_TOKENS", "7000"))
+
+MAIN_POINTS_PROMPT = "Carefully read through the document and consider what its main topics are and why they are important. Then, extract the key contribution or main point from the given text in one concise sentence."
+
+
+def extract_main_points(document: str) -> str:
+    """Extract the main points from a document using GPT. Documents over MAIN_POINTS_MAX_TOKENS
+    (e.g. full papers without a recognized abstract) are summarized from their beginning."""
+    # gpt-4 shares cl100k_base with the embedding model
+    encoding = get_encoding()
+    tokens = encoding.encode_ordinary(document)
+    if len(tokens) > MAIN_POINTS_MAX_TOKENS:
+        document = encoding.decode(tokens[:MAIN_POINTS_MAX_TOKENS])
+    response = client.chat.completions.create(
+        model="gpt-4",
+        messages=[
+            {"role": "system", "content": MAIN_POINTS_PROMPT},
+            {"role": "user", "content": document}
+        ],
+        max_tokens=100,
+        temperature=0.3
+    )
+    return response.choices[0].message.content.strip()
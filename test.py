@@ -36,6 +36,8 @@ def main():
     """
     
     # Step 3: Generate different versions of your abstract with self-reflection
+    # Retrieval and main points are shared by the three modes
+    context = rag.build_context(my_project, k=3)
     
     print("\n" + "="*50)
     print("GENERATING GENERAL AUDIENCE VERSION")
@@ -45,7 +47,8 @@ def main():
         mode="general",
         k=3,  # number of relevant documents to consider
         threshold=7.0,  # minimum acceptable score
-        max_attempts=3  # maximum number of improvement attempts
+        max_attempts=3,  # maximum number of improvement attempts
+        formatted_context=context
     )
     
     print("\n" + "="*50)
@@ -56,7 +59,8 @@ def main():
         mode="investor",
         k=3,
         threshold=7.0,
-        max_attempts=3
+        max_attempts=3,
+        formatted_context=context
     )
     
     print("\n" + "="*50)
@@ -67,7 +71,8 @@ def main():
         mode="conference",
         k=3,
         threshold=7.0,
-        max_attempts=3
+        max_attempts=3,
+        formatted_context=context
     )
     
     # Print final results
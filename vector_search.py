@@ -0,0 +1,138 @@
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+IVF_FILENAME = "ivf_index.npz"
+# Below this many vectors an exact scan takes a few ms, so no IVF index is built or used
+ANN_MIN_VECTORS = int(os.getenv("ANN_MIN_VECTORS", "10000"))
+# Row -> document mapping of a chunked vector DB
+CHUNK_DOC_FILENAME = "chunk_doc.npy"
+AGGREGATIONS = ("max", "sum")
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Return a contiguous float32 copy of vectors scaled to unit L2 norm."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first, without a full sort."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+def aggregate_hits(ids: np.ndarray, scores: np.ndarray, groups: np.ndarray, k: int,
+                   aggregation: str = "max") -> Tuple[np.ndarray, np.ndarray]:
+    """Collapse chunk hits into the top-k distinct groups (documents), scoring each group
+    by the max or the sum of its hit scores."""
+    group_ids, inverse = np.unique(groups[ids], return_inverse=True)
+    if aggregation == "max":
+        group_scores = np.full(len(group_ids), -np.inf, dtype=np.float32)
+        np.maximum.at(group_scores, inverse, scores)
+    elif aggregation == "sum":
+        group_scores = np.bincount(inverse, weights=scores, minlength=len(group_ids))
+    else:
+        raise ValueError(f"Unknown aggregation {aggregation!r}; expected one of {AGGREGATIONS}")
+    top = top_k_indices(group_scores, k)
+    return group_ids[top], group_scores[top]
+
+
+def assign_lists(vectors: np.ndarray, centroids: np.ndarray, chunk_size: int = 16384) -> np.ndarray:
+    """Index of the most similar centroid for every (unit-norm) vector."""
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), chunk_size):
+        chunk = np.asarray(vectors[start:start + chunk_size], dtype=np.float32)
+        labels[start:start + chunk_size] = np.argmax(chunk @ centroids.T, axis=1)
+    return labels
+
+
+def train_centroids(vectors: np.ndarray, n_lists: int, n_iter: int = 10,
+                    sample_size: Optional[int] = None, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on a sample of unit-norm vectors."""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), sample_size or n_lists * 256)
+    if sample_size < len(vectors):
+        sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))], dtype=np.float32)
+    else:
+        sample = np.asarray(vectors, dtype=np.float32)
+
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+    for _ in range(n_iter):
+        labels = assign_lists(sample, centroids)
+        counts = np.bincount(labels, minlength=n_lists)
+
+        # Sum members per cluster with one sort + reduceat instead of a Python loop
+        order = np.argsort(labels, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        nonempty = counts > 0
+        sums = np.zeros_like(centroids)
+        sums[nonempty] = np.add.reduceat(sample[order], starts[nonempty], axis=0)
+
+        centroids = normalize_rows(sums)
+        # Re-seed empty clusters with random points
+        if not nonempty.all():
+            centroids[~nonempty] = sample[rng.choice(len(sample), int((~nonempty).sum()), replace=False)]
+    return centroids
+
+
+class IVFIndex:
+    def __init__(self, centroids: np.ndarray, lists: List[np.ndarray]):
+        """Inverted-file index: k-means centroids plus the vector ids assigned to each."""
+        self.centroids = centroids
+        self.lists = lists
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, n_lists: Optional[int] = None, n_iter: int = 10,
+              seed: int = 0) -> "IVFIndex":
+        """Train centroids on unit-norm vectors and assign every vector to a list."""
+        if n_lists is None:
+            n_lists = int(np.sqrt(len(vectors)))
+        n_lists = max(1, min(n_lists, len(vectors)))
+        centroids = train_centroids(vectors, n_lists, n_iter=n_iter, seed=seed)
+        return cls.from_centroids(centroids, vectors)
+
+    @classmethod
+    def from_centroids(cls, centroids: np.ndarray, vectors: np.ndarray) -> "IVFIndex":
+        """Assign vectors to existing centroids without retraining."""
+        labels = assign_lists(vectors, centroids)
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=len(centroids))
+        return cls(centroids, np.split(order.astype(np.int64), np.cumsum(counts)[:-1]))
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray):
+        """Append new vector ids to their nearest lists."""
+        for list_id, vector_id in zip(assign_lists(vectors, self.centroids), ids):
+            self.lists[list_id] = np.append(self.lists[list_id], vector_id)
+
+    def __len__(self) -> int:
+        return sum(len(ids) for ids in self.lists)
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Ids stored in the nprobe lists whose centroids are closest to the query."""
+        probe = top_k_indices(self.centroids @ query, nprobe)
+        return np.concatenate([self.lists[i] for i in probe])
+
+    def search(self, vectors: np.ndarray, query: np.ndarray, k: int, nprobe: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Approximate top-k (ids, scores) for a unit-norm query against unit-norm vectors."""
+        candidates = self.candidates(query, nprobe)
+        scores = vectors[candidates] @ query
+        top = top_k_indices(scores, k)
+        return candidates[top], scores[top]
+
+    def save(self, path: str):
+        """Persist centroids and lists in CSR form (ids + offsets)."""
+        offsets = np.concatenate([[0], np.cumsum([len(ids) for ids in self.lists])])
+        ids = np.concatenate(self.lists) if self.lists else np.empty(0, dtype=np.int64)
+        np.savez(path, centroids=self.centroids, ids=ids, offsets=offsets)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        data = np.load(path)
+        offsets = data["offsets"]
+        return cls(data["centroids"], np.split(data["ids"], offsets[1:-1]))
@@ -0,0 +1,159 @@
+import os
+from typing import List, Optional
+
+import numpy as np
+
+from vector_search import normalize_rows
+
+# Compact formats for the in-memory search matrix; full precision stays in vectors.npy
+QUANTIZATIONS = ("float16", "int8")
+# How many compact-score candidates are rescored per requested hit
+RESCORE_FACTOR = 4
+# Rows decoded at a time; small enough for the float32 block to stay in cache
+BLOCK_SIZE = 1024
+
+
+def compact_filename(dtype: str) -> str:
+    """File holding the compact codes next to vectors.npy."""
+    return f"vectors_{dtype}.npz"
+
+
+def append_npy(path: str, rows: np.ndarray):
+    """Append rows along the first axis of the .npy array at path. Only the new rows and the header are
+    written, so appending stays proportional to the new data; if the header has no room for the new shape
+    (files from old numpy versions), the file is rewritten once with numpy's growth padding."""
+    rows = np.asarray(rows)
+    if not len(rows):
+        return
+    with open(path, "r+b") as f:
+        version = np.lib.format.read_magic(f)
+        header_start = f.tell() + (2 if version == (1, 0) else 4)  # Past the header length field
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        shape, fortran_order, dtype = read_header(f)
+        data_start = f.tell()
+        if tuple(rows.shape[1:]) != tuple(shape[1:]):
+            raise ValueError(f"Cannot append rows of shape {rows.shape[1:]} to {path} with shape {shape}")
+        header = repr({"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False,
+                       "shape": (shape[0] + len(rows),) + tuple(shape[1:])})
+        room = data_start - header_start
+        if not fortran_order and len(header) < room:
+            row_bytes = dtype.itemsize * int(np.prod(shape[1:], dtype=np.int64))
+            # Rows first: until the header is updated, readers only see the old rows
+            f.seek(data_start + shape[0] * row_bytes)
+            f.write(np.ascontiguousarray(rows, dtype=dtype).tobytes())
+            f.truncate()
+            f.seek(header_start)
+            f.write((header + " " * (room - len(header) - 1) + "\n").encode("latin1"))
+            f.flush()
+            os.fsync(f.fileno())
+            return
+
+    combined = np.concatenate([np.load(path, mmap_mode="r"), rows.astype(dtype)])
+    with open(f"{path}.tmp", "wb") as f:
+        np.save(f, combined)
+    os.replace(f"{path}.tmp", path)
+
+
+class QuantizedVectors:
+    def __init__(self, codes: np.ndarray, scale: Optional[np.ndarray] = None, full: Optional[np.ndarray] = None):
+        """Unit-norm vectors stored as float16 or int8 codes (int8 with a per-dimension scale).
+        full holds the matching full-precision rows (typically memory-mapped) used for rescoring."""
+        self.codes = codes
+        self.scale = scale
+        self.full = full
+        self.extra: List[np.ndarray] = []  # Full-precision rows appended after loading
+
+    @classmethod
+    def quantize(cls, vectors: np.ndarray, dtype: str, block_size: int = BLOCK_SIZE) -> "QuantizedVectors":
+        """Normalize and quantize vectors block by block, so a memory-mapped matrix is never fully loaded."""
+        if dtype not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization {dtype!r}; expected one of {QUANTIZATIONS}")
+        scale = None
+        if dtype == "int8":
+            # Symmetric per-dimension scale mapping the largest magnitude to 127
+            max_abs = np.zeros(vectors.shape[1], dtype=np.float32)
+            for start in range(0, len(vectors), block_size):
+                max_abs = np.maximum(max_abs, np.abs(normalize_rows(vectors[start:start + block_size])).max(axis=0))
+            scale = np.maximum(max_abs, 1e-12) / 127
+        store = cls(np.empty(vectors.shape, dtype=dtype), scale, full=vectors)
+        for start in range(0, len(vectors), block_size):
+            store.codes[start:start + block_size] = store.encode(normalize_rows(vectors[start:start + block_size]))
+        return store
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Codes for unit-norm float32 rows."""
+        if self.scale is None:
+            return vectors.astype(np.float16)
+        return np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def size(self) -> int:
+        return self.codes.size
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+
+    def __getitem__(self, ids) -> np.ndarray:
+        """Approximate float32 rows decoded from the codes."""
+        rows = self.codes[ids].astype(np.float32)
+        return rows if self.scale is None else rows * self.scale
+
+    def __matmul__(self, query: np.ndarray) -> np.ndarray:
+        """Approximate similarities of every row to a unit-norm query, decoding one block at a time."""
+        # Folding the scale into the query keeps the per-row work to one mat-vec over the codes
+        query = np.asarray(query, dtype=np.float32)
+        if self.scale is not None:
+            query = query * self.scale
+        scores = np.empty(len(self.codes), dtype=np.float32)
+        # One cache-sized float32 buffer per call, reused for every block
+        buffer = np.empty((min(BLOCK_SIZE, len(self.codes)), self.codes.shape[1]), dtype=np.float32)
+        for start in range(0, len(self.codes), BLOCK_SIZE):
+            block = self.codes[start:start + BLOCK_SIZE]
+            decoded = buffer[:len(block)]
+            np.copyto(decoded, block)
+            np.dot(decoded, query, out=scores[start:start + len(block)])
+        return scores
+
+    def append(self, vectors: np.ndarray):
+        """Add unit-norm rows; the existing int8 scale is reused, so outliers are clipped until rescoring."""
+        vectors = normalize_rows(vectors)
+        self.codes = np.concatenate([self.codes, self.encode(vectors)])
+        self.extra.extend(vectors)
+
+    def rescore(self, ids: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Exact similarities of the given rows, read from the full-precision vectors."""
+        num_full = len(self.full) if self.full is not None else 0
+        if num_full + len(self.extra) < len(self.codes):
+            # No full-precision rows to read from: fall back to the decoded codes
+            return self[ids] @ query
+        ids = np.asarray(ids)
+        scores = np.empty(len(ids), dtype=np.float32)
+        on_disk = ids < num_full
+        if on_disk.any():
+            # Sorted reads keep memory-mapped access sequential
+            order = np.argsort(ids[on_disk])
+            rows = normalize_rows(self.full[ids[on_disk][order]])
+            scores[np.flatnonzero(on_disk)[order]] = rows @ query
+        for position in np.flatnonzero(~on_disk):
+            scores[position] = self.extra[ids[position] - num_full] @ query
+        return scores
+
+    def save(self, path):
+        """Persist codes and scale (the full-precision rows stay in vectors.npy)."""
+        if self.scale is None:
+            np.savez(path, codes=self.codes)
+        else:
+            np.savez(path, codes=self.codes, scale=self.scale)
+
+    @classmethod
+    def load(cls, path: str, full: Optional[np.ndarray] = None) -> "QuantizedVectors":
+        data = np.load(path)
+        return cls(data["codes"], data["scale"] if "scale" in data else None, full=full)
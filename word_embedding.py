@@ -1,37 +1,138 @@
 import os
 import json
+import time
 import numpy as np
-import tiktoken
-from openai import OpenAI
-from dotenv import load_dotenv
-from typing import List
-
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from caching import text_hash
+from document_store import DOCUMENT_FIELDS, append_document_store, store_paths, write_document_store
+from embeddings import EMBEDDING_MODEL, count_tokens_batch, get_embeddings, get_encoding
+from summaries import extract_main_points
+from vector_search import ANN_MIN_VECTORS, CHUNK_DOC_FILENAME, IVF_FILENAME, IVFIndex, normalize_rows
+from vector_store import QUANTIZATIONS, QuantizedVectors, append_npy, compact_filename
 
 VEC_PATH = "db/vectors.npy"
 DOC_PATH = "db/documents.json"
+MANIFEST_FILENAME = "manifest.json"
 
 def count_tokens(text: str) -> int:
     """Count the number of tokens in a text string."""
-    encoding = tiktoken.get_encoding("cl100k_base")  # encoding for text-embedding-ada-002
-    return len(encoding.encode(text))
-
-def get_embedding(text: str) -> List[float]:
-    """Get embedding from OpenAI"""
-    response = client.embeddings.create(
-        model="text-embedding-ada-002",
-        input=text
-    )
-    return response.data[0].embedding
-
-def build_vector_database(folder_path: str, output_dir: str, max_tokens: int = 2000):
+    return len(get_encoding().encode_ordinary(text))  # shared encoder for text-embedding-ada-002
+
+def chunk_text(text: str, chunk_tokens: int, overlap: int) -> List[str]:
+    """Split text into chunks of at most chunk_tokens tokens, consecutive chunks sharing overlap tokens."""
+    if not 0 <= overlap < chunk_tokens:
+        raise ValueError(f"overlap must be in [0, {chunk_tokens}), got {overlap}")
+    encoding = get_encoding()
+    tokens = encoding.encode_ordinary(text)
+    step = chunk_tokens - overlap
+    # The last start is the first one whose chunk reaches the end of the text
+    starts = range(0, max(len(tokens) - chunk_tokens, 0) + step, step)
+    return [encoding.decode(tokens[start:start + chunk_tokens]) for start in starts]
+
+def atomic_write(path: str, write: Callable, binary: bool = True):
+    """Write a file through a temporary sibling and rename it into place."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb" if binary else "w", encoding=None if binary else "utf-8") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def append_json_items(path: str, items: List[str], closing: bytes, separator: str, newline: str = ""):
+    """Insert serialized items before the closing bracket(s) that end the JSON file at path, in place,
+    so the file stays valid JSON without rewriting what it already holds."""
+    with open(path, "r+b") as f:
+        size = f.seek(0, os.SEEK_END)
+        tail_start = max(0, size - 256)
+        f.seek(tail_start)
+        tail = f.read().rstrip()
+        if not tail.endswith(closing):
+            raise ValueError(f"{path} does not end with {closing.decode()}")
+        body = tail[:-len(closing)].rstrip()
+        empty = body.endswith({b"]": b"[", b"}": b"{"}[closing[:1]])
+        f.seek(tail_start + len(body))
+        text = (newline if empty else separator) + separator.join(items) + newline + closing.decode()
+        f.write(text.encode("utf-8"))
+        f.truncate()
+        f.flush()
+        os.fsync(f.fileno())
+
+def load_manifest(output_dir: str, chunking: Optional[Dict[str, int]] = None) -> Dict[str, Dict]:
+    """Map content sha256 -> {"filename", "document", "rows"} for the vector DB in output_dir.
+    Databases built before manifests existed are indexed from documents.json.
+    Documents stay listed when the embedding model or chunking changed, so their main points are reused;
+    "rows" is None for those whose vectors must be recomputed, and whole-document rows kept across a
+    chunking change are marked "recheck" (they must be chunked if they exceed the new chunk size)."""
+    manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        old_model, old_chunking = manifest.get("model"), manifest.get("chunking")
+        # Manifests written before chunking stored a single "row" shared by the vector and the document
+        entries = {
+            digest: entry if "rows" in entry
+            else {"filename": entry["filename"], "document": entry["row"], "rows": [entry["row"]]}
+            for digest, entry in manifest["entries"].items()
+        }
+    else:
+        doc_path = os.path.join(output_dir, "documents.json")
+        if not os.path.exists(doc_path) or not os.path.exists(os.path.join(output_dir, "vectors.npy")):
+            return {}
+        # Without a manifest, chunk rows cannot be mapped to documents; check before parsing the documents
+        if os.path.exists(os.path.join(output_dir, CHUNK_DOC_FILENAME)):
+            return {}
+        with open(doc_path, 'r', encoding='utf-8') as f:
+            documents = json.load(f)
+        old_model, old_chunking = EMBEDDING_MODEL, None
+        entries = {
+            text_hash(doc["content"], normalize=False): {"filename": doc["filename"], "document": row, "rows": [row]}
+            for row, doc in enumerate(documents)
+        }
+
+    if old_model != EMBEDDING_MODEL:
+        print(f"Embedding model changed ({old_model} -> {EMBEDDING_MODEL}); re-embedding everything, keeping main points")
+        for entry in entries.values():
+            entry["rows"] = None
+    elif old_chunking != chunking:
+        print(f"Chunking changed ({old_chunking} -> {chunking}); re-embedding chunked documents, keeping main points")
+        for entry in entries.values():
+            # A single row is always a whole-document embedding: only documents over the limit are chunked
+            if len(entry["rows"]) > 1:
+                entry["rows"] = None
+            elif chunking is not None:
+                entry["recheck"] = True
+    return entries
+
+def build_vector_database(folder_path: str, output_dir: str, max_tokens: int = 2000,
+                          build_index: bool = True, n_lists: Optional[int] = None, summarize: bool = True,
+                          retrain_index: bool = False, summary_concurrency: int = 4,
+                          chunk: bool = False, chunk_overlap: int = 200, quantize: Optional[str] = None):
+    """Incrementally build the vector DB for folder_path.
+    Files whose content hash is already in the manifest reuse their stored rows; only new or changed
+    files are embedded (in batched requests), and files no longer in the folder are dropped.
+    Files over max_tokens are skipped, or with chunk=True split into max_tokens chunks overlapping by
+    chunk_overlap tokens, one vector row each, with the row -> document mapping saved in chunk_doc.npy.
+    quantize ("float16" or "int8") also writes compact search codes; existing ones are always refreshed."""
     os.makedirs(output_dir, exist_ok=True)
 
-    vectors = []
-    documents = []
+    chunking = {"max_tokens": max_tokens, "overlap": chunk_overlap} if chunk else None
+    previous = load_manifest(output_dir, chunking)
+    old_vectors, old_documents = None, []
+    if previous:
+        old_vectors = np.load(os.path.join(output_dir, "vectors.npy"), mmap_mode="r")
+        with open(os.path.join(output_dir, "documents.json"), 'r', encoding='utf-8') as f:
+            old_documents = json.load(f)
+
+    start_time = time.perf_counter()
 
-    for filename in os.listdir(folder_path):
+    # Pass 1: read files and reuse rows whose content hash is unchanged
+    rows = []       # (digest, doc_entry, embeddings or None) in filename order, one embedding per chunk
+    new_rows = []   # positions in rows that still need embeddings
+    recheck = []    # positions of reused whole-document rows that may now need chunking
+    seen = {}
+    reused = 0
+    for filename in sorted(os.listdir(folder_path)):
         if not filename.endswith(".txt"):
             continue
 
@@ -39,29 +140,287 @@ def build_vector_database(folder_path: str, output_dir: str, max_tokens: int = 2
         with open(filepath, 'r', encoding='utf-8') as f:
             content = f.read()
 
-        # Check token length
-        num_tokens = count_tokens(content)
-        if num_tokens > max_tokens:
-            print(f"Skipping {filename}: {num_tokens} tokens (exceeds {max_tokens} limit)")
+        digest = text_hash(content, normalize=False)
+        if digest in seen:
+            print(f"Skipping duplicate: {filename} (same content as {seen[digest]})")
             continue
+        seen[digest] = filename
 
-        doc_entry = {"filename": filename, "content": content}
-        if doc_entry in documents:
-            print(f"Skipping cached: {filename}")
-            continue
+        if digest in previous:
+            # Unchanged content: reuse the stored document entry (with its main point) and, when still
+            # valid, its embeddings
+            entry = previous[digest]
+            doc_entry = old_documents[entry["document"]]
+            doc_entry["filename"] = filename
+            if entry["rows"] is None:
+                new_rows.append(len(rows))
+                rows.append((digest, doc_entry, None))
+                continue
+            if entry.get("recheck"):
+                recheck.append(len(rows))
+            rows.append((digest, doc_entry, [old_vectors[row] for row in entry["rows"]]))
+            reused += 1
+        else:
+            new_rows.append(len(rows))
+            rows.append((digest, {"filename": filename, "content": content}, None))
+
+    # Whole-document embeddings kept across a chunking change must fit the new chunk size
+    for i, num_tokens in zip(recheck, count_tokens_batch([rows[i][1]["content"] for i in recheck])):
+        if num_tokens > max_tokens:
+            rows[i] = (rows[i][0], rows[i][1], None)
+            new_rows.append(i)
+            reused -= 1
+    new_rows.sort()
+
+    # Pass 2: tokenize new files in parallel; chunk or drop the ones over the limit
+    token_counts = count_tokens_batch([rows[i][1]["content"] for i in new_rows])
+    pieces = []     # (position in rows, text, token count or None)
+    for i, num_tokens in zip(new_rows, token_counts):
+        content = rows[i][1]["content"]
+        if num_tokens <= max_tokens:
+            pieces.append((i, content, num_tokens))
+        elif chunk:
+            pieces.extend((i, text, None) for text in chunk_text(content, max_tokens, chunk_overlap))
+        else:
+            print(f"Skipping {rows[i][1]['filename']}: {num_tokens} tokens (exceeds {max_tokens} limit)")
+            rows[i] = None
+    chunk_counts = iter(count_tokens_batch([text for _, text, num_tokens in pieces if num_tokens is None]))
+    pieces = [(i, text, next(chunk_counts) if num_tokens is None else num_tokens) for i, text, num_tokens in pieces]
+
+    # Pass 3: embed in token-packed batches, several requests at a time
+    embedded = sorted({i for i, _, _ in pieces})
+    print(f"Embedding {len(embedded)} new or changed files ({len(pieces)} chunks)...")
+    embeddings = get_embeddings([text for _, text, _ in pieces],
+                                token_counts=[num_tokens for _, _, num_tokens in pieces])
+    for i in embedded:
+        rows[i] = (rows[i][0], rows[i][1], [])
+    for (i, _, _), embedding in zip(pieces, embeddings):
+        rows[i][2].append(embedding)
+    rows = [row for row in rows if row is not None]
+
+    if summarize:
+        # Stored so RAGSystem.format_context does not call GPT per request
+        add_main_points([doc_entry for _, doc_entry, _ in rows], summary_concurrency)
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Ingested {len(embedded)} documents in {elapsed:.1f}s ({len(embedded) / max(elapsed, 1e-9):.1f} docs/sec)")
+    removed = len(set(previous) - {digest for digest, _, _ in rows})
+    print(f"{len(embedded)} embedded, {reused} unchanged, {removed} removed; "
+          f"{sum(len(doc_vectors) for _, _, doc_vectors in rows)} vectors for {len(rows)} documents")
+
+    write_vector_database(output_dir, rows, chunking, build_index=build_index, n_lists=n_lists,
+                          retrain_index=retrain_index, quantize=quantize)
+
+
+def write_vector_database(output_dir: str, rows: List[Tuple[str, Dict, List]], chunking: Optional[Dict[str, int]],
+                          build_index: bool = True, n_lists: Optional[int] = None, retrain_index: bool = False,
+                          quantize: Optional[str] = None):
+    """Write (digest, doc_entry, embeddings) rows as the vector DB in output_dir, with its manifest."""
+    vectors, chunk_doc, entries = [], [], {}
+    for document, (digest, doc_entry, doc_vectors) in enumerate(rows):
+        entries[digest] = {"filename": doc_entry["filename"], "document": document,
+                           "rows": list(range(len(vectors), len(vectors) + len(doc_vectors)))}
+        vectors.extend(doc_vectors)
+        chunk_doc.extend([document] * len(doc_vectors))
+    documents = [doc_entry for _, doc_entry, _ in rows]
+
+    # Replace each file atomically; the manifest goes last so it never points at rows that are not written yet
+    vector_array = np.array(vectors) if vectors else np.empty((0, 0))
+    atomic_write(os.path.join(output_dir, "vectors.npy"), lambda f: np.save(f, vector_array))
+    atomic_write(os.path.join(output_dir, "documents.json"), lambda f: json.dump(documents, f, indent=2), binary=False)
+    # Memory-mapped copy that RAGSystem serves from; documents.json stays the source for incremental builds
+    write_document_store(documents, output_dir)
+    chunk_doc_path = os.path.join(output_dir, CHUNK_DOC_FILENAME)
+    if chunking is not None:
+        atomic_write(chunk_doc_path, lambda f: np.save(f, np.array(chunk_doc, dtype=np.int64)))
+    elif os.path.exists(chunk_doc_path):
+        os.remove(chunk_doc_path)
 
-        print(f"Embedding: {filename} ({num_tokens} tokens)")
-        embedding = get_embedding(content)
+    for dtype in QUANTIZATIONS:
+        if vectors and (dtype == quantize or os.path.exists(os.path.join(output_dir, compact_filename(dtype)))):
+            build_compact_vectors(output_dir, dtype)
 
-        vectors.append(embedding)
-        documents.append(doc_entry)
+    if build_index and vectors:
+        build_ann_index(output_dir, n_lists=n_lists, retrain=retrain_index)
 
-    np.save(os.path.join(output_dir, "vectors.npy"), np.array(vectors))
-    with open(os.path.join(output_dir, "documents.json"), "w", encoding="utf-8") as f:
-        json.dump(documents, f, indent=2)
+    manifest = {"model": EMBEDDING_MODEL, "chunking": chunking, "entries": entries}
+    atomic_write(os.path.join(output_dir, MANIFEST_FILENAME), lambda f: json.dump(manifest, f), binary=False)
 
     print("Vector DB saved.")
 
 
+class VectorDBAppender:
+    def __init__(self, output_dir: str):
+        """Appends documents to the vector DB in output_dir as they arrive. New vectors, document entries and
+        manifest entries are written in place after the existing ones, so streaming N documents costs O(N)
+        in total rather than a full rewrite per batch. The manifest is read once, here; nothing else may
+        modify the DB while the appender is in use."""
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        self.chunking = None
+        manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get("model", EMBEDDING_MODEL) != EMBEDDING_MODEL:
+                raise ValueError(f"{output_dir} was embedded with {manifest['model']}, not {EMBEDDING_MODEL}; "
+                                 f"rebuild it with build_vector_database first")
+            self.chunking = manifest.get("chunking")
+        self.entries = load_manifest(output_dir, self.chunking)
+        self.num_documents = len(self.entries)
+        self.num_rows = sum(len(entry["rows"]) for entry in self.entries.values())
+        self.in_place = os.path.exists(manifest_path) and self.is_consistent()
+
+    def is_consistent(self) -> bool:
+        """Every file holds exactly the rows the manifest lists, so appends can go in place.
+        False for empty or pre-manifest databases, and after an interrupted append."""
+        vectors_path = os.path.join(self.output_dir, "vectors.npy")
+        if not self.num_rows or not os.path.exists(vectors_path) or not os.path.exists(os.path.join(self.output_dir, "documents.json")):
+            return False
+        counts = [len(np.load(vectors_path, mmap_mode="r")) - self.num_rows]
+        for field in DOCUMENT_FIELDS:
+            offsets_path = store_paths(self.output_dir, field)[1]
+            if not os.path.exists(offsets_path):
+                return False
+            counts.append(len(np.load(offsets_path, mmap_mode="r")) - 1 - self.num_documents)
+        if self.chunking is not None:
+            counts.append(len(np.load(os.path.join(self.output_dir, CHUNK_DOC_FILENAME), mmap_mode="r")) - self.num_rows)
+        return not any(counts)
+
+    def append(self, new_rows: List[Tuple[str, Dict, List]]) -> int:
+        """Append (digest, doc_entry, embeddings) rows, skipping contents the DB already holds.
+        Returns the number of documents added."""
+        added = []
+        for row in new_rows:
+            if row[0] not in self.entries:
+                self.entries[row[0]] = None  # Placeholder until the row is written
+                added.append(row)
+        if not added:
+            return 0
+        if self.in_place:
+            self.append_in_place(added)
+        else:
+            self.rewrite(added)
+        return len(added)
+
+    def append_in_place(self, added: List[Tuple[str, Dict, List]]):
+        vectors, chunk_doc, entries = [], [], {}
+        for document, (digest, doc_entry, doc_vectors) in enumerate(added, start=self.num_documents):
+            start = self.num_rows + len(vectors)
+            entries[digest] = {"filename": doc_entry["filename"], "document": document,
+                               "rows": list(range(start, start + len(doc_vectors)))}
+            vectors.extend(doc_vectors)
+            chunk_doc.extend([document] * len(doc_vectors))
+        documents = [doc_entry for _, doc_entry, _ in added]
+
+        # Same order as write_vector_database: the manifest goes last, and a mismatch between the files
+        # and the manifest (an interrupted append) makes the next appender rewrite the DB from the manifest
+        append_json_items(os.path.join(self.output_dir, "documents.json"),
+                          ["  " + json.dumps(doc, indent=2).replace("\n", "\n  ") for doc in documents],
+                          b"]", ",\n", newline="\n")
+        append_npy(os.path.join(self.output_dir, "vectors.npy"), np.array(vectors))
+        if self.chunking is not None:
+            append_npy(os.path.join(self.output_dir, CHUNK_DOC_FILENAME), np.array(chunk_doc, dtype=np.int64))
+        append_document_store(documents, self.output_dir)
+        append_json_items(os.path.join(self.output_dir, MANIFEST_FILENAME),
+                          [f"{json.dumps(digest)}: {json.dumps(entry)}" for digest, entry in entries.items()],
+                          b"}}", ", ")
+
+        self.entries.update(entries)
+        self.num_documents += len(added)
+        self.num_rows += len(vectors)
+
+    def rewrite(self, added: List[Tuple[str, Dict, List]]):
+        """Write the rows the manifest lists plus the added ones as a fresh DB; later appends go in place."""
+        rows = []
+        previous = {digest: entry for digest, entry in self.entries.items() if entry is not None}
+        if previous:
+            vectors = np.load(os.path.join(self.output_dir, "vectors.npy"), mmap_mode="r")
+            with open(os.path.join(self.output_dir, "documents.json"), 'r', encoding='utf-8') as f:
+                documents = json.load(f)
+            for digest, entry in sorted(previous.items(), key=lambda item: item[1]["document"]):
+                rows.append((digest, documents[entry["document"]], [vectors[row] for row in entry["rows"]]))
+        write_vector_database(self.output_dir, rows + added, self.chunking, build_index=False)
+        self.entries = load_manifest(self.output_dir, self.chunking)
+        self.num_documents = len(self.entries)
+        self.num_rows = sum(len(entry["rows"]) for entry in self.entries.values())
+        self.in_place = self.is_consistent()
+
+    def finish(self, build_index: bool = True):
+        """Refresh the files that are rebuilt rather than appended: existing compact codes and the ANN index."""
+        if not self.num_rows:
+            return
+        for dtype in QUANTIZATIONS:
+            if os.path.exists(os.path.join(self.output_dir, compact_filename(dtype))):
+                build_compact_vectors(self.output_dir, dtype)
+        if build_index:
+            build_ann_index(self.output_dir, retrain=False)
+
+
+def add_main_points(documents: List[Dict], concurrency: int = 4) -> int:
+    """Set "main_point" on the documents lacking one, `concurrency` requests at a time.
+    A document whose request fails is left without one (RAGSystem extracts it on demand) rather than
+    failing the others. Returns the number summarized."""
+    missing = [doc for doc in documents if not doc.get("main_point")]
+
+    def summarize(doc: Dict) -> Optional[str]:
+        try:
+            doc["main_point"] = extract_main_points(doc["content"])
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+        return None
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        errors = list(pool.map(summarize, missing))
+    failures = [(doc["filename"], error) for doc, error in zip(missing, errors) if error is not None]
+    for filename, error in failures:
+        print(f"✗ Could not summarize {filename}: {error}")
+    print(f"Summarized {len(missing) - len(failures)} documents, {len(failures)} failed.")
+    return len(missing) - len(failures)
+
+
+def summarize_vector_database(output_dir: str, concurrency: int = 4):
+    """Add a main-point summary to every document in an existing vector DB that lacks one."""
+    doc_path = os.path.join(output_dir, "documents.json")
+    with open(doc_path, 'r', encoding='utf-8') as f:
+        documents = json.load(f)
+
+    if add_main_points(documents, concurrency):
+        atomic_write(doc_path, lambda f: json.dump(documents, f, indent=2), binary=False)
+        write_document_store(documents, output_dir)
+
+
+def build_compact_vectors(output_dir: str, dtype: str):
+    """Quantize vectors.npy to float16 or int8 codes for RAGSystem(quantization=dtype)."""
+    full = np.load(os.path.join(output_dir, "vectors.npy"), mmap_mode="r")
+    vectors = QuantizedVectors.quantize(full, dtype)
+    atomic_write(os.path.join(output_dir, compact_filename(dtype)), vectors.save)
+    print(f"{dtype} vectors saved ({vectors.nbytes / max(len(vectors), 1):.0f} bytes/vector, "
+          f"{full.dtype.itemsize * full.shape[1]} in vectors.npy).")
+
+
+def build_ann_index(output_dir: str, n_lists: Optional[int] = None, retrain: bool = True,
+                    min_vectors: int = ANN_MIN_VECTORS):
+    """Build an IVF index over vectors.npy and save it next to it.
+    With retrain=False, centroids of an existing index are reused and vectors are only reassigned.
+    Below min_vectors no index is built (and a previous one is removed), so retrieval stays exact."""
+    vectors = normalize_rows(np.load(os.path.join(output_dir, "vectors.npy"), mmap_mode="r"))
+    index_path = os.path.join(output_dir, IVF_FILENAME)
+    if len(vectors) < min_vectors:
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        print(f"No ANN index for {len(vectors)} vectors (below {min_vectors}); retrieval uses exact search.")
+        return
+    centroids = IVFIndex.load(index_path).centroids if not retrain and os.path.exists(index_path) else None
+    # Retrain anyway when a different list count is requested or the corpus has outgrown the lists
+    if (centroids is not None and n_lists in (None, len(centroids))
+            and len(centroids) * 2 > int(np.sqrt(len(vectors)))):
+        index = IVFIndex.from_centroids(centroids, vectors)
+    else:
+        index = IVFIndex.build(vectors, n_lists=n_lists)
+    atomic_write(index_path, index.save)
+    print(f"ANN index saved ({len(index.centroids)} lists over {len(vectors)} vectors).")
+
+
 if __name__ == "__main__":
     build_vector_database(folder_path="datas/front_matter", output_dir="datas/db")